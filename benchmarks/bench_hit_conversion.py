@@ -0,0 +1,70 @@
+"""Compares the conversion of run search hits through elasticsearch_dsl Hit objects and
+through their raw _source dicts, reading the data of the runs or only their info.
+
+    python benchmarks/bench_hit_conversion.py --runs 1000 --metrics 100 --params 50 --tags 30
+"""
+import argparse
+import timeit
+import mock
+from typing import Any, Dict
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
+
+from mlflow.entities import LifecycleStage, RunStatus
+
+from mlflow_elasticsearchstore.elasticsearch_store import ElasticsearchStore
+
+
+def build_response(runs: int, metrics: int, params: int, tags: int) -> Dict[str, Any]:
+    hits = []
+    for i in range(runs):
+        source = {"run_id": f'run{i}', "experiment_id": "1", "user_id": "user",
+                  "status": RunStatus.to_string(RunStatus.FINISHED), "start_time": i,
+                  "end_time": i + 1, "lifecycle_stage": LifecycleStage.ACTIVE,
+                  "artifact_uri": f'hdfs://artifacts/run{i}',
+                  "latest_metrics": [{"key": f'metric{j}', "value": j * 0.1, "timestamp": i,
+                                      "step": j, "is_nan": False} for j in range(metrics)],
+                  "params": [{"key": f'param{j}', "value": f'value{j}'}
+                             for j in range(params)],
+                  "tags": [{"key": f'tag{j}', "value": f'value{j}'} for j in range(tags)]}
+        hits.append({"_index": "mlflow-runs", "_id": f'run{i}', "_source": source,
+                     "sort": [i, f'run{i}']})
+    return {"took": 1, "hits": {"total": {"value": runs}, "hits": hits}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--metrics", type=int, default=100)
+    parser.add_argument("--params", type=int, default=50)
+    parser.add_argument("--tags", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Lazy index initialization, the store does not send any request to the cluster
+    with mock.patch('elasticsearch_dsl.connections.create_connection'):
+        store = ElasticsearchStore("elasticsearch://localhost:9200?lazy_index_init=true",
+                                   "artifact_uri")
+    raw_response = build_response(args.runs, args.metrics, args.params, args.tags)
+
+    def hit_path() -> None:
+        # A new Response per call, as Hit objects are built and cached on first access
+        response = Response(Search(), raw_response)
+        [store._hit_to_mlflow_run(hit) for hit in response]
+
+    def source_path() -> None:
+        runs, _ = store._to_search_runs_page(Response(Search(), raw_response), args.runs + 1)
+        [run.data for run in runs]
+
+    def source_info_path() -> None:
+        runs, _ = store._to_search_runs_page(Response(Search(), raw_response), args.runs + 1)
+        [run.info for run in runs]
+
+    for name, path in (("Hit objects", hit_path), ("raw _source", source_path),
+                       ("raw _source, info only", source_info_path)):
+        best = min(timeit.repeat(path, number=1, repeat=args.repeat))
+        print(f'{name:>22}: {best * 1000:8.1f} ms for {args.runs} runs')
+
+
+if __name__ == "__main__":
+    main()
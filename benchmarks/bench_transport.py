@@ -0,0 +1,64 @@
+"""Measures the serialization and gzip compression costs of typical store payloads.
+
+    python benchmarks/bench_transport.py --metrics 10000 --runs 10000
+"""
+import gzip
+import argparse
+import timeit
+from typing import Any, Callable, List, Tuple
+from elasticsearch.serializer import JSONSerializer
+
+from mlflow_elasticsearchstore.transport import OrjsonSerializer, orjson_available
+
+from bench_hit_conversion import build_response
+
+
+def build_bulk_metrics(metrics: int) -> List[Any]:
+    actions: List[Any] = []
+    for i in range(metrics):
+        actions.append({"index": {"_index": "mlflow-metrics", "_routing": "run0"}})
+        actions.append({"key": f'metric{i % 100}', "value": i * 0.1, "timestamp": 1600000000000 + i,
+                        "step": i, "is_nan": False, "run_id": "run0"})
+    return actions
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--metrics", type=int, default=10000,
+                        help="number of metric documents of the bulk request")
+    parser.add_argument("--runs", type=int, default=10000,
+                        help="number of runs of the search response")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    serializers: List[Tuple[str, Any]] = [("json", JSONSerializer())]
+    if orjson_available:
+        serializers.append(("orjson", OrjsonSerializer()))
+    else:
+        print("orjson is not installed, only measuring the default serializer")
+    bulk_actions = build_bulk_metrics(args.metrics)
+    search_response = build_response(args.runs, 20, 10, 10)
+
+    for name, serializer in serializers:
+        dumps_ms = best_time(lambda: "\n".join(map(serializer.dumps, bulk_actions)), args.repeat)
+        body = JSONSerializer().dumps(search_response)
+        loads_ms = best_time(lambda: serializer.loads(body), args.repeat)
+        print(f'{name:>6}: bulk of {args.metrics} metrics dumped in {dumps_ms:7.1f} ms, '
+              f'search response of {args.runs} runs loaded in {loads_ms:7.1f} ms')
+
+    for name, payload in (("bulk request", "\n".join(map(JSONSerializer().dumps, bulk_actions))),
+                          ("search response", JSONSerializer().dumps(search_response))):
+        raw = payload.encode("utf-8")
+        compressed = gzip.compress(raw)
+        compress_ms = best_time(lambda: gzip.compress(raw), args.repeat)
+        decompress_ms = best_time(lambda: gzip.decompress(compressed), args.repeat)
+        print(f'gzip {name}: {len(raw) / 1e6:.1f} MB -> {len(compressed) / 1e6:.2f} MB, '
+              f'compressed in {compress_ms:.1f} ms, decompressed in {decompress_ms:.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import os
+import time
+import asyncio
+import threading
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Sequence, Tuple, TypeVar, cast
+from elasticsearch.exceptions import NotFoundError, TransportError
+from elasticsearch_dsl import Document, Search
+from elasticsearch_dsl.response import Response
+try:
+    from elasticsearch import AsyncElasticsearch
+    from elasticsearch.helpers import async_scan
+    async_available = True
+except ImportError:
+    async_available = False
+
+from mlflow.store.entities.paged_list import PagedList
+from mlflow.store.tracking import SEARCH_MAX_RESULTS_DEFAULT
+from mlflow.protos.databricks_pb2 import (INTERNAL_ERROR, REQUEST_LIMIT_EXCEEDED,
+                                          RESOURCE_DOES_NOT_EXIST, TEMPORARILY_UNAVAILABLE)
+from mlflow.entities import (Experiment, RunTag, Metric, Param, Run, RunInfo,
+                             RunStatus, LifecycleStage, ViewType)
+try:
+    from mlflow.entities import Columns
+except ImportError:
+    pass
+from mlflow.exceptions import MlflowException
+from mlflow.utils.validation import (
+    _validate_batch_log_limits,
+    _validate_batch_log_data,
+    _validate_run_id,
+)
+
+from mlflow_elasticsearchstore.backpressure import (CircuitBreakerOpenError, backoff_delays,
+                                                    is_failure, is_retryable)
+from mlflow_elasticsearchstore.elasticsearch_store import ElasticsearchStore
+from mlflow_elasticsearchstore.models import (ElasticExperiment, ElasticRun, ElasticMetric,
+                                              ElasticColumnCatalog)
+from mlflow_elasticsearchstore.transport import opaque_id
+
+T = TypeVar('T')
+F = TypeVar('F', bound=Callable[..., Any])
+
+_opaque_id: 'ContextVar[str]' = ContextVar("opaque_id", default=None)
+
+
+def traced_async(method: F) -> F:
+    # Coroutine counterpart of transport.traced, the name follows the tasks of the call
+    @wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if _opaque_id.get() is not None:
+            return await method(*args, **kwargs)
+        token = _opaque_id.set(opaque_id(method.__name__))
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _opaque_id.reset(token)
+    return cast(F, wrapper)
+
+
+class AsyncElasticsearchStore:
+    """Asyncio variant of the run methods of ElasticsearchStore.
+
+    Requests are compiled by an ElasticsearchStore and sent through one AsyncElasticsearch
+    client, whose connection pool is shared by every coroutine of the store.
+    """
+
+    def __init__(self, store_uri: str = None, artifact_uri: str = None,
+                 store: ElasticsearchStore = None) -> None:
+        if not async_available:
+            raise MlflowException("AsyncElasticsearchStore requires the async extra of "
+                                  "elasticsearch, install mlflow-elasticsearchstore[async]")
+        self.store = store if store is not None else ElasticsearchStore(store_uri, artifact_uri)
+        self.client = AsyncElasticsearch(**self.store._connection_options())
+        self._read_client = None
+        if "read_hosts" in self.store.store_options:
+            self._read_client = AsyncElasticsearch(**self.store._connection_options(read=True))
+
+    @property
+    def read_client(self) -> Any:
+        return self._read_client if self._read_client is not None else self.client
+
+    async def close(self) -> None:
+        await self.client.close()
+        if self._read_client is not None:
+            await self._read_client.close()
+
+    async def _execute(self, method_name: str, s: Search, client: Any = None) -> Response:
+        s = self.store._sample_profile(self.store._apply_search_limits(method_name, s))
+        start = time.monotonic()
+        raw_response = await self._request(
+            (client or self.client).search, index=s._index, body=s.to_dict(),
+            opaque_id=_opaque_id.get(), request_timeout=self.store._request_timeout(method_name),
+            **s._params)
+        response = Response(s, raw_response)
+        self.store._log_search(method_name, s, response, time.monotonic() - start)
+        self.store._check_partial_results(method_name, response)
+        return response
+
+    async def _get_document(self, document_class: Any, id: str, routing: str = None,
+                            client: Any = None) -> Any:
+        hit = await self._request((client or self.client).get,
+                                  index=self.store._index_name(document_class), id=id,
+                                  routing=routing, opaque_id=_opaque_id.get())
+        return document_class.from_es(hit)
+
+    async def _request(self, method: Callable[..., Awaitable[Any]], **kwargs: Any) -> Any:
+        # Same backoff and circuit breaker as BackpressureTransport, that the async client lacks
+        breaker = self.store.circuit_breaker
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitBreakerOpenError("N/A", "The circuit breaker of the cluster is open")
+        delays = backoff_delays(self.store.backoff_retries, self.store.backoff_initial,
+                                self.store.backoff_max)
+        while True:
+            try:
+                response = await method(**kwargs)
+            except TransportError as e:
+                if not is_retryable(e):
+                    if breaker is not None and is_failure(e):
+                        breaker.record_failure()
+                    elif breaker is not None:
+                        breaker.record_success()
+                    raise
+                if breaker is not None:
+                    breaker.record_rejection()
+                delay = next(delays, None)
+                if delay is None:
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return response
+
+    async def _save_document(self, document: Document) -> None:
+        doc_meta = {k: document.meta[k] for k in ("id", "routing") if k in document.meta}
+        await self._request(self.client.index, index=self.store._index_name(type(document)),
+                            body=document.to_dict(), opaque_id=_opaque_id.get(), **doc_meta)
+
+    async def _update_document(self, document: Document, **fields: Any) -> None:
+        for key, value in fields.items():
+            setattr(document, key, value)
+        values = document.to_dict()
+        doc_meta = {k: document.meta[k] for k in ("id", "routing") if k in document.meta}
+        await self._request(self.client.update, index=self.store._index_name(type(document)),
+                            body={"doc": {k: values.get(k) for k in fields}},
+                            opaque_id=_opaque_id.get(), **doc_meta)
+
+    async def _bulk_index(self, documents: List[Document]) -> None:
+        delays = backoff_delays(self.store.backoff_retries, self.store.backoff_initial,
+                                self.store.backoff_max)
+        while documents:
+            response = await self._request(self.client.bulk,
+                                           body=self.store._build_bulk_body(documents),
+                                           opaque_id=_opaque_id.get())
+            documents = self.store._rejected_documents(documents, response)
+            if documents:
+                await asyncio.sleep(self.store._bulk_retry_delay(delays, documents))
+
+    async def _update_column_catalog(self, experiment_id: str, metrics: Sequence[str] = (),
+                                     params: Sequence[str] = (),
+                                     tags: Sequence[str] = ()) -> None:
+        columns = self.store._new_catalog_columns(experiment_id, metrics, params, tags)
+        if not columns or self.store._shed_column_catalog_update(experiment_id):
+            return
+        await self._request(
+            self.client.update, index=self.store._index_name(ElasticColumnCatalog),
+            id=experiment_id, body=self.store._build_catalog_update_body(experiment_id, columns),
+            retry_on_conflict=5, opaque_id=_opaque_id.get())
+        self.store._mark_catalog_columns(experiment_id, columns)
+
+    async def _get_experiment(self, experiment_id: str) -> ElasticExperiment:
+        try:
+            return await self._get_document(ElasticExperiment, experiment_id)
+        except NotFoundError:
+            raise MlflowException(
+                "No Experiment with id={} exists".format(experiment_id), RESOURCE_DOES_NOT_EXIST
+            )
+
+    @traced_async
+    async def get_experiment(self, experiment_id: str) -> Experiment:
+        return (await self._get_experiment(experiment_id)).to_mlflow_entity()
+
+    async def _get_run(self, run_id: str) -> ElasticRun:
+        if not self.store.experiment_routing:
+            return await self._get_document(ElasticRun, run_id)
+        routing = self.store._cached_run_routing(run_id)
+        if routing is None:
+            routing = self.store._resolve_run_routing(run_id, await self._execute(
+                "get_run", self.store._build_run_routing_search(run_id)))
+        try:
+            return await self._get_document(ElasticRun, run_id, routing=routing)
+        except NotFoundError:
+            if routing is None:
+                raise
+            return await self._get_document(ElasticRun, run_id)
+
+    @traced_async
+    async def get_run(self, run_id: str) -> Run:
+        try:
+            run = await self._get_run(run_id=run_id)
+        except NotFoundError:
+            raise MlflowException(
+                "Run with id={} not found".format(run_id), RESOURCE_DOES_NOT_EXIST
+            )
+        return run.to_mlflow_entity()
+
+    @traced_async
+    async def create_run(self, experiment_id: str, user_id: str,
+                         start_time: int, tags: List[RunTag]) -> Run:
+        if self.store.lazy_index_init:
+            self.store._init_indices()
+        run_id = self.store._new_run_id(experiment_id)
+        experiment = await self._get_experiment(experiment_id)
+        run = self.store._build_run(run_id, experiment, experiment_id, user_id, start_time, tags)
+        await self._save_document(run)
+        self.store._invalidate_search_cache(experiment_id)
+        await self._update_column_catalog(experiment_id, tags=[tag.key for tag in tags])
+        return run.to_mlflow_entity()
+
+    @traced_async
+    async def update_run_info(self, run_id: str, run_status: RunStatus,
+                              end_time: int) -> RunInfo:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        await self._update_document(run, status=RunStatus.to_string(run_status),
+                                    end_time=end_time)
+        self.store._invalidate_search_cache(run.experiment_id)
+        return run.to_mlflow_entity()._info
+
+    @traced_async
+    async def delete_run(self, run_id: str) -> None:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        await self._update_document(run, lifecycle_stage=LifecycleStage.DELETED)
+        self.store._invalidate_search_cache(run.experiment_id)
+
+    @traced_async
+    async def restore_run(self, run_id: str) -> None:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_deleted(run)
+        await self._update_document(run, lifecycle_stage=LifecycleStage.ACTIVE)
+        self.store._invalidate_search_cache(run.experiment_id)
+
+    @traced_async
+    async def log_metric(self, run_id: str, metric: Metric) -> None:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        await self._save_document(self.store._build_metric(run, metric))
+        if self.store.metric_sort_fields:
+            await self._update_document(run, latest_metrics=run.latest_metrics,
+                                        metric_sort=run.metric_sort)
+        else:
+            await self._update_document(run, latest_metrics=run.latest_metrics)
+        self.store._invalidate_search_cache(run.experiment_id)
+        await self._update_column_catalog(run.experiment_id, metrics=[metric.key])
+
+    @traced_async
+    async def log_param(self, run_id: str, param: Param) -> None:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        self.store._log_param(run, param)
+        await self._update_document(run, params=run.params)
+        self.store._invalidate_search_cache(run.experiment_id)
+        await self._update_column_catalog(run.experiment_id, params=[param.key])
+
+    @traced_async
+    async def set_tag(self, run_id: str, tag: RunTag) -> None:
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        self.store._set_tag(run, tag)
+        await self._update_document(run, tags=run.tags)
+        self.store._invalidate_search_cache(run.experiment_id)
+        await self._update_column_catalog(run.experiment_id, tags=[tag.key])
+
+    @traced_async
+    async def update_artifacts_location(self, run_id: str, new_artifacts_location: str) -> None:
+        run = await self._get_run(run_id)
+        await self._update_document(run, artifact_uri=new_artifacts_location)
+        self.store._invalidate_search_cache(run.experiment_id)
+
+    @traced_async
+    async def log_batch(self, run_id: str, metrics: List[Metric],
+                        params: List[Param], tags: List[RunTag]) -> None:
+        _validate_run_id(run_id)
+        _validate_batch_log_data(metrics, params, tags)
+        _validate_batch_log_limits(metrics, params, tags)
+        run = await self._get_run(run_id)
+        self.store._check_run_is_active(run)
+        try:
+            new_metrics = [self.store._build_metric(run, metric) for metric in metrics]
+            for param in params:
+                self.store._log_param(run, param)
+            for tag in tags:
+                self.store._set_tag(run, tag)
+            await self._bulk_index(new_metrics)
+            await self._save_document(run)
+            await self._update_column_catalog(run.experiment_id,
+                                              metrics=[metric.key for metric in metrics],
+                                              params=[param.key for param in params],
+                                              tags=[tag.key for tag in tags])
+        except MlflowException as e:
+            raise e
+        except CircuitBreakerOpenError as e:
+            raise MlflowException(e, TEMPORARILY_UNAVAILABLE)
+        except TransportError as e:
+            raise MlflowException(e, REQUEST_LIMIT_EXCEEDED if is_retryable(e) else INTERNAL_ERROR)
+        except Exception as e:
+            raise MlflowException(e, INTERNAL_ERROR)
+        finally:
+            self.store._invalidate_search_cache(run.experiment_id)
+
+    @traced_async
+    async def get_metric_history(self, run_id: str, metric_key: str) -> List[Metric]:
+        s = self.store._apply_search_limits(
+            "get_metric_history", self.store._build_metric_history_search(run_id, metric_key))
+        hits: Any = async_scan(self.read_client, query=s.to_dict(), index=s._index,
+                               request_timeout=self.store._request_timeout("get_metric_history"),
+                               opaque_id=_opaque_id.get(),
+                               scroll_kwargs={"opaque_id": _opaque_id.get()}, **s._params)
+        if self.store.metric_doc_values:
+            return [self.store._doc_values_to_mlflow_metric(hit["fields"]) async for hit in hits]
+        return [self.store._hit_to_mlflow_metric(ElasticMetric.from_es(hit)) async for hit in hits]
+
+    async def _aggregate_columns(self, experiment_id: str,
+                                 stages: List[LifecycleStage]) -> Dict[str, List[str]]:
+        columns: Dict[str, List[str]] = {"latest_metrics": [], "params": [], "tags": []}
+        pages = self.store._first_list_columns_pages()
+        while pages:
+            response = await self._execute("list_all_columns",
+                                           self.store._build_list_columns_search(
+                                               experiment_id, stages, pages),
+                                           self.read_client)
+            pages = self.store._next_list_columns_pages(pages, response, columns)
+        return columns
+
+    @traced_async
+    async def rebuild_column_catalog(self, experiment_id: str) -> Dict[str, List[str]]:
+        columns = await self._aggregate_columns(
+            experiment_id, LifecycleStage.view_type_to_stages(ViewType.ALL))
+        await self._request(
+            self.client.update, index=self.store._index_name(ElasticColumnCatalog),
+            id=experiment_id, body=self.store._build_catalog_update_body(experiment_id, columns),
+            retry_on_conflict=5, opaque_id=_opaque_id.get())
+        return columns
+
+    @traced_async
+    async def list_all_columns(self, experiment_id: str, run_view_type: str) -> 'Columns':
+        if not self.store.column_catalog:
+            columns = await self._aggregate_columns(
+                experiment_id, LifecycleStage.view_type_to_stages(run_view_type))
+        else:
+            try:
+                catalog = await self._get_document(ElasticColumnCatalog, experiment_id,
+                                                   client=self.read_client)
+                columns = {column_type: list(getattr(catalog, column_type))
+                           for column_type in ("latest_metrics", "params", "tags")}
+            except NotFoundError:
+                columns = await self.rebuild_column_catalog(experiment_id)
+        return Columns(metrics=columns["latest_metrics"], params=columns["params"],
+                       tags=columns["tags"])
+
+    @traced_async
+    async def _search_runs(self, experiment_ids: List[str], filter_string: str,
+                           run_view_type: str, max_results: int = SEARCH_MAX_RESULTS_DEFAULT,
+                           order_by: List[str] = None, page_token: str = None,
+                           columns_to_whitelist: List[str] = None) -> Tuple[List[Run], str]:
+        search_cache = self.store.search_cache
+        cache_key = None
+        if search_cache is not None:
+            cache_key = self.store._build_search_cache_key(
+                experiment_ids, filter_string, run_view_type, max_results, order_by,
+                page_token, columns_to_whitelist)
+            cached_page = search_cache.get(cache_key)
+            if cached_page is not None:
+                return cached_page
+            if not self.store._is_search_cacheable(experiment_ids):
+                cache_key = None
+        s = self.store._build_search_runs_search(experiment_ids, filter_string, run_view_type,
+                                                 max_results, order_by, page_token)
+        page = self.store._to_search_runs_page(
+            await self._execute("search_runs", s, self.read_client), max_results,
+            columns_to_whitelist)
+        if cache_key is not None:
+            search_cache.set(cache_key, page)
+        return page
+
+    @traced_async
+    async def search_runs(self, experiment_ids: List[str], filter_string: str,
+                          run_view_type: str, max_results: int = SEARCH_MAX_RESULTS_DEFAULT,
+                          order_by: List[str] = None, page_token: str = None,
+                          columns_to_whitelist: List[str] = None) -> PagedList:
+        runs, token = await self._search_runs(experiment_ids, filter_string, run_view_type,
+                                              max_results, order_by, page_token,
+                                              columns_to_whitelist)
+        return PagedList(runs, token)
+
+
+class AsyncElasticsearchStoreFacade(ElasticsearchStore):
+    """Synchronous store serving the run methods with an AsyncElasticsearchStore.
+
+    The coroutines run on one event loop owned by a background thread, so any number of
+    server threads share its connection pool; other methods are served by ElasticsearchStore.
+    A forked worker does not inherit the thread, so the loop and the async clients are created
+    again in the child on first use.
+    """
+
+    def __init__(self, store_uri: str = None, artifact_uri: str = None) -> None:
+        super(AsyncElasticsearchStoreFacade, self).__init__(store_uri, artifact_uri)
+        self._fork_lock = threading.Lock()
+        self._start_async_store()
+
+    def _start_async_store(self) -> None:
+        self._async_store = AsyncElasticsearchStore(store=self)
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                             name="mlflow-elasticsearchstore-loop", daemon=True)
+        self._loop_thread.start()
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self) -> None:
+        # The loop of the parent never runs in the child and its clients share the sockets of
+        # the parent: both are dropped without being closed
+        with self._fork_lock:
+            if self._pid != os.getpid():
+                self._start_async_store()
+
+    @property
+    def async_store(self) -> AsyncElasticsearchStore:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        return self._async_store
+
+    def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_run(self, run_id: str) -> Run:
+        return self._run(self.async_store.get_run(run_id))
+
+    def create_run(self, experiment_id: str, user_id: str,
+                   start_time: int, tags: List[RunTag]) -> Run:
+        return self._run(self.async_store.create_run(experiment_id, user_id, start_time, tags))
+
+    def update_run_info(self, run_id: str, run_status: RunStatus, end_time: int) -> RunInfo:
+        return self._run(self.async_store.update_run_info(run_id, run_status, end_time))
+
+    def delete_run(self, run_id: str) -> None:
+        self._run(self.async_store.delete_run(run_id))
+
+    def restore_run(self, run_id: str) -> None:
+        self._run(self.async_store.restore_run(run_id))
+
+    def log_metric(self, run_id: str, metric: Metric) -> None:
+        self._run(self.async_store.log_metric(run_id, metric))
+
+    def log_param(self, run_id: str, param: Param) -> None:
+        self._run(self.async_store.log_param(run_id, param))
+
+    def set_tag(self, run_id: str, tag: RunTag) -> None:
+        self._run(self.async_store.set_tag(run_id, tag))
+
+    def update_artifacts_location(self, run_id: str, new_artifacts_location: str) -> None:
+        self._run(self.async_store.update_artifacts_location(run_id, new_artifacts_location))
+
+    def log_batch(self, run_id: str, metrics: List[Metric],
+                  params: List[Param], tags: List[RunTag]) -> None:
+        self._run(self.async_store.log_batch(run_id, metrics, params, tags))
+
+    def get_metric_history(self, run_id: str, metric_key: str) -> List[Metric]:
+        return self._run(self.async_store.get_metric_history(run_id, metric_key))
+
+    def list_all_columns(self, experiment_id: str, run_view_type: str) -> 'Columns':
+        return self._run(self.async_store.list_all_columns(experiment_id, run_view_type))
+
+    def _search_runs(self, experiment_ids: List[str], filter_string: str,
+                     run_view_type: str, max_results: int = SEARCH_MAX_RESULTS_DEFAULT,
+                     order_by: List[str] = None, page_token: str = None,
+                     columns_to_whitelist: List[str] = None) -> Tuple[List[Run], str]:
+        return self._run(self.async_store._search_runs(experiment_ids, filter_string,
+                                                       run_view_type, max_results, order_by,
+                                                       page_token, columns_to_whitelist))
@@ -0,0 +1,96 @@
+import time
+import random
+import threading
+from typing import Any, Iterator
+from elasticsearch.exceptions import ConnectionError, ConnectionTimeout, TransportError
+
+# Statuses of requests that the cluster rejected without executing them
+RETRYABLE_STATUSES = (429, 503)
+DEFAULT_BACKOFF_RETRIES = 3
+DEFAULT_BACKOFF_INITIAL = .1
+DEFAULT_BACKOFF_MAX = 10.
+# Error of the writes to an index blocked by a migration, until its alias is swapped
+WRITE_BLOCK_ERROR = (403, "cluster_block_exception")
+
+
+def is_retryable_status(status: Any, error_type: Any) -> bool:
+    return status in RETRYABLE_STATUSES or (status, error_type) == WRITE_BLOCK_ERROR
+
+
+def is_retryable(error: TransportError) -> bool:
+    # A timed out request may have been executed, retrying it could duplicate a write
+    if isinstance(error, ConnectionError):
+        return not isinstance(error, ConnectionTimeout)
+    return is_retryable_status(error.status_code, error.error)
+
+
+def is_failure(error: TransportError) -> bool:
+    # Timed out requests and server errors are not retried but show an unhealthy cluster
+    if isinstance(error, ConnectionError):
+        return True
+    return isinstance(error.status_code, int) and error.status_code >= 500
+
+
+def backoff_delays(retries: int, initial: float, maximum: float) -> Iterator[float]:
+    # Exponential backoff with full jitter, so that rejected clients do not retry in lockstep
+    for attempt in range(retries):
+        yield random.uniform(0, min(maximum, initial * 2 ** attempt))
+
+
+def max_backoff_time(retries: int, initial: float, maximum: float) -> float:
+    # Longest total delay of backoff_delays, the time a rejected request is retried for
+    return sum(min(maximum, initial * 2 ** attempt) for attempt in range(retries))
+
+
+class CircuitBreakerOpenError(TransportError):
+    pass
+
+
+class CircuitBreaker:
+    """Fails requests fast once the cluster kept rejecting them.
+
+    The breaker opens after `threshold` consecutive failures and lets a single request
+    through every `reset_timeout` seconds, closing again when one succeeds. The cluster is
+    not healthy while the breaker is open or for `reset_timeout` seconds after a rejection.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float = None
+        self.rejected_at: float = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    @property
+    def is_healthy(self) -> bool:
+        return not self.is_open and (self.rejected_at is None or
+                                     time.monotonic() - self.rejected_at >= self.reset_timeout)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half open, the next failure opens the breaker for another reset_timeout
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_rejection(self) -> None:
+        self.rejected_at = time.monotonic()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
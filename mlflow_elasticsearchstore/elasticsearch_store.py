@@ -1,16 +1,27 @@
+import json
 import uuid
 import math
+import time
+import random
+import logging
+import warnings
+import threading
 from operator import attrgetter
-from typing import List, Tuple, Any, Dict
-from elasticsearch_dsl import Search, connections, Q
-from elasticsearch.exceptions import NotFoundError
+from typing import List, Tuple, Any, Callable, Dict, Hashable, Iterator, Sequence, Set
+from elasticsearch_dsl import Search, MultiSearch, UpdateByQuery, connections, Q
+from elasticsearch_dsl.response import Response
+from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import NotFoundError, TransportError
 from six.moves import urllib
+import re
 import ast
 
 from mlflow.store.tracking.abstract_store import AbstractStore
+from mlflow.store.entities.paged_list import PagedList
 from mlflow.store.tracking import SEARCH_MAX_RESULTS_THRESHOLD, SEARCH_MAX_RESULTS_DEFAULT
 from mlflow.protos.databricks_pb2 import (
-    INVALID_PARAMETER_VALUE, INVALID_STATE, INTERNAL_ERROR, RESOURCE_DOES_NOT_EXIST)
+    INVALID_PARAMETER_VALUE, INVALID_STATE, INTERNAL_ERROR, RESOURCE_DOES_NOT_EXIST,
+    REQUEST_LIMIT_EXCEEDED, TEMPORARILY_UNAVAILABLE)
 from mlflow.entities import (Experiment, RunTag, Metric, Param, Run, RunInfo, RunData,
                              RunStatus, ExperimentTag, LifecycleStage, ViewType)
 try:
@@ -19,6 +30,7 @@ except ImportError:
     pass
 from mlflow.exceptions import MlflowException
 from mlflow.utils.uri import append_to_uri_path
+from mlflow.utils.mlflow_tags import MLFLOW_RUN_NAME
 from mlflow.utils.search_utils import SearchUtils
 from mlflow.utils.validation import (
     _validate_batch_log_limits,
@@ -30,9 +42,73 @@ from mlflow.utils.validation import (
     _validate_tag,
 )
 
+from mlflow_elasticsearchstore.backpressure import (DEFAULT_BACKOFF_INITIAL, DEFAULT_BACKOFF_MAX,
+                                                    DEFAULT_BACKOFF_RETRIES, CircuitBreaker,
+                                                    CircuitBreakerOpenError, backoff_delays,
+                                                    is_retryable, is_retryable_status)
+from mlflow_elasticsearchstore.entities import LazyRun
+from mlflow_elasticsearchstore.index_settings import load_index_settings
 from mlflow_elasticsearchstore.models import (ElasticExperiment, ElasticRun, ElasticMetric,
                                               ElasticParam, ElasticTag,
-                                              ElasticLatestMetric, ElasticExperimentTag)
+                                              ElasticLatestMetric, ElasticExperimentTag,
+                                              ElasticColumnCatalog, metric_sort_key,
+                                              INDEX_DOCUMENTS, MAPPING_VERSION,
+                                              MAPPING_VERSION_KEY, METRIC_DOC_VALUE_FIELDS,
+                                              LIKE_SUBFIELDS_MAPPING_VERSION, index_name,
+                                              like_subfields_mappings)
+from mlflow_elasticsearchstore.search_cache import SearchCache, InMemorySearchCache
+from mlflow_elasticsearchstore.search_utils import ElasticsearchSearchUtils
+from mlflow_elasticsearchstore.transport import (OpaqueIdTransport, OrjsonSerializer,
+                                                 orjson_available, traced)
+
+_logger = logging.getLogger(__name__)
+
+READ_CONNECTION_ALIAS = "mlflow-elasticsearchstore-read"
+INDEX_PREFIX_PATTERN = re.compile(r"[a-z0-9][a-z0-9._+-]*")
+# Buckets of one list columns request, below the search.max_buckets of 10000 before 7.9
+LIST_COLUMNS_MAX_BUCKETS = 9000
+
+# Indices initialized by this process, keyed on the hosts of the cluster
+_initialized_indices: Set[Tuple[Tuple[str, ...], str]] = set()
+_initialized_indices_lock = threading.Lock()
+
+
+class PartialSearchResultsWarning(UserWarning):
+    pass
+
+
+def _parse_bool(value: str) -> bool:
+    return value is not None and value.lower() in ("true", "1", "yes")
+
+
+TIME_UNITS = {"nanos": 1e-9, "micros": 1e-6, "ms": 1e-3, "s": 1., "m": 60., "h": 3600.,
+              "d": 86400.}
+
+
+def _parse_time_value(value: str) -> float:
+    # Elasticsearch time value in seconds, -1 disables the periodic refresh
+    if str(value) == "-1":
+        return math.inf
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)(nanos|micros|ms|s|m|h|d)', str(value).strip())
+    if match is None:
+        raise MlflowException(f'Invalid time value {value!r}', INVALID_PARAMETER_VALUE)
+    return float(match.group(1)) * TIME_UNITS[match.group(2)]
+
+
+def _get_mapping_versions(indices: List[str], using: Any = "default") -> Dict[str, Any]:
+    try:
+        response = connections.get_connection(using).indices.get(
+            index=",".join(indices), ignore_unavailable=True, allow_no_indices=True,
+            filter_path=f'*.aliases,*.mappings._meta.{MAPPING_VERSION_KEY}')
+    except NotFoundError:
+        return {}
+    versions = {}
+    for index, description in response.items():
+        version = description.get("mappings", {}).get("_meta", {}).get(MAPPING_VERSION_KEY)
+        # The store reaches the versioned indices through their aliases
+        for name in [index, *description.get("aliases", {})]:
+            versions[name] = version
+    return versions
 
 
 class ElasticsearchStore(AbstractStore):
@@ -47,18 +123,235 @@ class ElasticsearchStore(AbstractStore):
         "<=": ["range", "must"],
         "<": ["range", "must"],
         "LIKE": ["wildcard", "must"],
-        "ILIKE": ["wildcard", "must"]
+        "ILIKE": ["wildcard", "must"],
+        "IN": ["terms", "must"]
     }
+    attribute_fields = ["status", "start_time", "end_time", "user_id", "run_id"]
+    transport_options: Dict[str, Callable[[str], Any]] = {
+        "maxsize": int, "timeout": float, "max_retries": int, "retry_on_timeout": _parse_bool,
+        "sniff_on_start": _parse_bool, "sniff_on_connection_fail": _parse_bool,
+        "sniffer_timeout": float, "sniff_timeout": float}
 
-    def __init__(self, store_uri: str = None, artifact_uri: str = None) -> None:
+    def __init__(self, store_uri: str = None, artifact_uri: str = None,
+                 search_cache: SearchCache = None) -> None:
         self.is_plugin = True
         self.artifact_root_uri = artifact_uri
-        connections.create_connection(hosts=[urllib.parse.urlparse(store_uri).netloc])
-        ElasticExperiment.init()
-        ElasticRun.init()
-        ElasticMetric.init()
+        parsed_uri = urllib.parse.urlparse(store_uri)
+        self.store_options = dict(urllib.parse.parse_qsl(parsed_uri.query))
+        self._parsed_uri = parsed_uri
+        if search_cache is None and "search_cache_ttl" in self.store_options:
+            search_cache = InMemorySearchCache(
+                ttl=float(self.store_options["search_cache_ttl"]),
+                max_entries=int(self.store_options.get("search_cache_size", 1000)))
+        self.search_cache = search_cache
+        self.metric_sort_fields = _parse_bool(self.store_options.get("metric_sort_fields"))
+        self.like_subfields = _parse_bool(self.store_options.get("like_subfields"))
+        self.slow_query_threshold_ms = float(self.store_options["slow_query_threshold_ms"]) \
+            if "slow_query_threshold_ms" in self.store_options else None
+        self.profile_sample_rate = float(self.store_options.get("profile_sample_rate", 0))
+        self.search_preference = self.store_options.get("search_preference", "session")
+        self._session_preference = uuid.uuid4().hex
+        self.experiment_routing = self.store_options.get("run_routing") == "experiment"
+        self.metric_run_routing = self.store_options.get("metric_routing") == "run_id"
+        self.columns_page_size = int(self.store_options.get("columns_page_size", 1000))
+        self.columns_max_page_size = int(self.store_options.get("columns_max_page_size", 3000))
+        self.column_catalog = _parse_bool(self.store_options.get("column_catalog"))
+        if self.column_catalog:
+            self._catalog_columns = InMemorySearchCache(ttl=math.inf, max_entries=100000)
+        if self.experiment_routing:
+            self._run_routing_cache = InMemorySearchCache(
+                ttl=math.inf, max_entries=int(self.store_options.get("run_routing_cache_size",
+                                                                     10000)))
+        self.index_prefix = self.store_options.get("index_prefix", "mlflow")
+        if not INDEX_PREFIX_PATTERN.fullmatch(self.index_prefix):
+            raise MlflowException(f'Invalid index_prefix {self.index_prefix!r}, index names must '
+                                  'be lowercase and start with a letter or digit',
+                                  INVALID_PARAMETER_VALUE)
+        self.metric_source_excludes = _parse_bool(self.store_options.get("metric_source_excludes"))
+        self.metric_doc_values = self.metric_source_excludes or \
+            _parse_bool(self.store_options.get("metric_doc_values"))
+        self.lazy_index_init = _parse_bool(self.store_options.get("lazy_index_init"))
+        self.index_settings = load_index_settings(self.store_options)
+        # Searches only see the writes to runs once the runs index is refreshed
+        self.search_cache_settle_time = _parse_time_value(
+            self.index_settings["runs"].get("refresh_interval", "1s"))
+        self.backoff_retries = int(self.store_options.get("backoff_retries",
+                                                          DEFAULT_BACKOFF_RETRIES))
+        self.backoff_initial = float(self.store_options.get("backoff_initial",
+                                                            DEFAULT_BACKOFF_INITIAL))
+        self.backoff_max = float(self.store_options.get("backoff_max", DEFAULT_BACKOFF_MAX))
+        self.circuit_breaker = CircuitBreaker(
+            int(self.store_options["circuit_breaker_threshold"]),
+            float(self.store_options.get("circuit_breaker_reset_timeout", 30.))) \
+            if "circuit_breaker_threshold" in self.store_options else None
+        private_client = _parse_bool(self.store_options.get("private_client"))
+        connection_options = self._connection_options()
+        # Key of the cluster in _initialized_indices
+        self._cluster = tuple(connection_options["hosts"])
+        if private_client:
+            # A client of its own, which does not replace the default connection of the process
+            self.using: Any = Elasticsearch(transport_class=OpaqueIdTransport,
+                                            circuit_breaker=self.circuit_breaker,
+                                            **self._backpressure_options(),
+                                            **connection_options)
+        else:
+            connections.create_connection(transport_class=OpaqueIdTransport,
+                                          circuit_breaker=self.circuit_breaker,
+                                          **self._backpressure_options(),
+                                          **connection_options)
+            self.using = "default"
+        # Searches of runs, metric histories and columns can be sent to other nodes or to a
+        # replica cluster, away from the writes of the runs
+        self.read_using: Any = self.using
+        if "read_hosts" in self.store_options:
+            if private_client:
+                self.read_using = Elasticsearch(transport_class=OpaqueIdTransport,
+                                                **self._backpressure_options(),
+                                                **self._connection_options(read=True))
+            else:
+                self.read_using = READ_CONNECTION_ALIAS
+                connections.create_connection(alias=READ_CONNECTION_ALIAS,
+                                              transport_class=OpaqueIdTransport,
+                                              **self._backpressure_options(),
+                                              **self._connection_options(read=True))
+        if not self.lazy_index_init:
+            self._init_indices()
         super(ElasticsearchStore, self).__init__()
 
+    def _index_documents(self) -> Dict[str, Any]:
+        return {index: document for index, document in INDEX_DOCUMENTS.items()
+                if index != "columns" or self.column_catalog}
+
+    def _index_name(self, document: Any) -> str:
+        return index_name(document, self.index_prefix)
+
+    def _init_indices(self) -> None:
+        # Creates the indices or puts their mappings, once per process and cluster, and only
+        # when the indices do not carry the current mapping version
+        with _initialized_indices_lock:
+            pending = {self._index_name(document): (index, document)
+                       for index, document in self._index_documents().items()
+                       if (self._cluster, self._index_name(document))
+                       not in _initialized_indices}
+            if not pending:
+                return
+            versions = _get_mapping_versions(list(pending), self.using)
+            for name, (index, document) in pending.items():
+                if versions.get(name) != self._mapping_version(index):
+                    document.init(index=name, using=self.using,
+                                  settings=self.index_settings[index],
+                                  source_excludes=self._source_excludes(index),
+                                  mappings=self._index_mappings(index))
+                _initialized_indices.add((self._cluster, name))
+
+    def _mapping_version(self, index: str) -> Any:
+        # The optional mappings are part of the version, so that enabling them puts them
+        return LIKE_SUBFIELDS_MAPPING_VERSION if index == "runs" and self.like_subfields \
+            else MAPPING_VERSION
+
+    def _index_mappings(self, index: str) -> Dict[str, Any]:
+        return like_subfields_mappings() if index == "runs" and self.like_subfields else None
+
+    def _source_excludes(self, index: str) -> List[str]:
+        return METRIC_DOC_VALUE_FIELDS if index == "metrics" and self.metric_source_excludes \
+            else None
+
+    def _backpressure_options(self) -> Dict[str, Any]:
+        return {"backoff_retries": self.backoff_retries, "backoff_initial": self.backoff_initial,
+                "backoff_max": self.backoff_max}
+
+    def _connection_options(self, read: bool = False) -> Dict[str, Any]:
+        hosts_option = "read_hosts" if read else "hosts"
+        option_hosts = self.store_options[hosts_option].split(",") \
+            if hosts_option in self.store_options else []
+        options: Dict[str, Any] = {"hosts": option_hosts if read
+                                   else [self._parsed_uri.netloc] + option_hosts}
+        if option_hosts and self._parsed_uri.username is not None:
+            # The credentials of the uri also apply to the hosts given as options
+            options["http_auth"] = (urllib.parse.unquote(self._parsed_uri.username),
+                                    urllib.parse.unquote(self._parsed_uri.password or ""))
+        for name, parse in self.transport_options.items():
+            if name in self.store_options:
+                options[name] = parse(self.store_options[name])
+        if _parse_bool(self.store_options.get("http_compress")):
+            options["http_compress"] = True
+        if self.store_options.get("serializer") == "orjson":
+            if orjson_available:
+                options["serializer"] = OrjsonSerializer()
+            else:
+                _logger.warning("orjson is not installed, using the default JSON serializer")
+        return options
+
+    def _sample_profile(self, s: Search) -> Search:
+        if self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate:
+            return s.extra(profile=True)
+        return s
+
+    def _log_search(self, method_name: str, s: Search, response: Response,
+                    elapsed: float) -> None:
+        elapsed_ms = elapsed * 1000
+        is_slow = self.slow_query_threshold_ms is not None and \
+            elapsed_ms >= self.slow_query_threshold_ms
+        is_profiled = s.to_dict().get("profile", False)
+        if not (is_slow or is_profiled):
+            return
+        raw_response = response.to_dict()
+        details = {"query": s.to_dict(), "took": raw_response.get("took"),
+                   "shards": raw_response.get("_shards"),
+                   "hits": raw_response.get("hits", {}).get("total")}
+        if is_profiled:
+            details["profile"] = raw_response.get("profile")
+        log = _logger.warning if is_slow else _logger.info
+        log("%s search took %.0f ms: %s", method_name, elapsed_ms, json.dumps(details))
+
+    def _search_option(self, method_name: str, option: str) -> str:
+        return self.store_options.get(f'{method_name}_{option}',
+                                      self.store_options.get(f'search_{option}'))
+
+    def _apply_search_limits(self, method_name: str, s: Search) -> Search:
+        if self.lazy_index_init:
+            # The indices may not be created yet, searching them finds nothing
+            s = s.params(ignore_unavailable=True, allow_no_indices=True)
+        timeout = self._search_option(method_name, "timeout")
+        if timeout is not None:
+            s = s.extra(timeout=timeout)
+        terminate_after = self._search_option(method_name, "terminate_after")
+        if terminate_after is not None:
+            s = s.extra(terminate_after=int(terminate_after))
+        return s
+
+    def _request_timeout(self, method_name: str) -> float:
+        request_timeout = self._search_option(method_name, "request_timeout")
+        return float(request_timeout) if request_timeout is not None else None
+
+    def _check_partial_results(self, method_name: str, response: Response) -> None:
+        if not isinstance(response, Response):
+            return
+        raw_response = response.to_dict()
+        reasons = []
+        if raw_response.get("timed_out"):
+            reasons.append("the search timed out")
+        if raw_response.get("terminated_early"):
+            reasons.append("the search was terminated early")
+        shards = raw_response.get("_shards", {})
+        if shards.get("failed"):
+            reasons.append(f'{shards["failed"]} of {shards.get("total")} shards failed')
+        if reasons:
+            message = f'{method_name} returned partial results: {", ".join(reasons)}'
+            _logger.warning(message)
+            warnings.warn(message, PartialSearchResultsWarning)
+
+    def _execute_search(self, method_name: str, s: Search) -> Response:
+        s = self._sample_profile(self._apply_search_limits(method_name, s))
+        request_timeout = self._request_timeout(method_name)
+        if request_timeout is not None:
+            s = s.params(request_timeout=request_timeout)
+        start = time.monotonic()
+        response = s.execute()
+        self._log_search(method_name, s, response, time.monotonic() - start)
+        self._check_partial_results(method_name, response)
+        return response
+
     def _hit_to_mlflow_experiment(self, hit: Any) -> Experiment:
         return Experiment(experiment_id=hit.meta.id, name=hit.name,
                           artifact_location=hit.artifact_location,
@@ -95,46 +388,102 @@ class ElasticsearchStore(AbstractStore):
                     t.key in columns_to_whitelist_key_dict["tags"])]
         return RunData(metrics=metrics, params=params, tags=tags)
 
+    def _source_to_mlflow_run(self, source: Dict[str, Any],
+                              columns_to_whitelist_key_dict: dict = None) -> Run:
+        # Same conversion as _hit_to_mlflow_run, on the raw _source of a hit
+        return LazyRun(self._source_to_mlflow_run_info(source), source,
+                       columns_to_whitelist_key_dict)
+
+    def _source_to_mlflow_run_info(self, source: Dict[str, Any]) -> RunInfo:
+        return RunInfo(run_uuid=source["run_id"], run_id=source["run_id"],
+                       experiment_id=str(source["experiment_id"]),
+                       user_id=source.get("user_id"),
+                       status=source.get("status"),
+                       start_time=source.get("start_time"),
+                       end_time=source.get("end_time"),
+                       lifecycle_stage=source.get("lifecycle_stage"),
+                       artifact_uri=source.get("artifact_uri"))
+
     def _hit_to_mlflow_metric(self, hit: Any) -> Metric:
         return Metric(key=hit.key,
                       value=hit.value if not (hasattr(hit, 'is_nan')
                                               and hit.is_nan) else float("nan"),
                       timestamp=hit.timestamp, step=hit.step)
 
+    def _doc_values_to_mlflow_metric(self, fields: Dict[str, List[Any]]) -> Metric:
+        return Metric(key=fields["key"][0],
+                      value=fields["value"][0] if not fields.get("is_nan", [False])[0]
+                      else float("nan"),
+                      timestamp=fields["timestamp"][0], step=fields["step"][0])
+
     def _hit_to_mlflow_param(self, hit: Any) -> Param:
         return Param(key=hit.key, value=hit.value)
 
     def _hit_to_mlflow_tag(self, hit: Any) -> RunTag:
         return RunTag(key=hit.key, value=hit.value)
 
+    @traced
     def list_experiments(self, view_type: str = ViewType.ACTIVE_ONLY) -> List[Experiment]:
         stages = LifecycleStage.view_type_to_stages(view_type)
-        response = Search(index="mlflow-experiments").filter("terms",
-                                                             lifecycle_stage=stages).execute()
+        response = self._execute_search("list_experiments", Search(
+            using=self.using, index=self._index_name(ElasticExperiment))
+            .filter("terms", lifecycle_stage=stages))
         return [self._hit_to_mlflow_experiment(e) for e in response]
 
+    def _aggregation_params(self, experiment_id: str = None) -> Dict[str, Any]:
+        # Sends repeated aggregations to the same shard copies, whose request cache is warm
+        params: Dict[str, Any] = {"size": 0, "request_cache": True}
+        if self.search_preference == "experiment" and experiment_id is not None:
+            params["preference"] = f'experiment-{experiment_id}'
+        elif self.search_preference != "none":
+            params["preference"] = self._session_preference
+        return params
+
+    @traced
+    def get_cache_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        if isinstance(self.search_cache, InMemorySearchCache):
+            stats["search_cache"] = {"hits": self.search_cache.hits,
+                                     "misses": self.search_cache.misses}
+        index_names = [self._index_name(ElasticExperiment), self._index_name(ElasticRun)]
+        response = connections.get_connection(self.using).indices.stats(
+            index=index_names, metric="request_cache")
+        stats["request_cache"] = {}
+        for name, index_stats in response["indices"].items():
+            request_cache = index_stats["total"]["request_cache"]
+            lookups = request_cache["hit_count"] + request_cache["miss_count"]
+            stats["request_cache"][name] = dict(
+                request_cache,
+                hit_ratio=request_cache["hit_count"] / lookups if lookups else None)
+        return stats
+
     def _list_experiments_name(self) -> List[str]:
-        s = Search(index="mlflow-experiments")
+        s = Search(using=self.using, index=self._index_name(ElasticExperiment))
         s.aggs.bucket("exp_names", "terms", field="name")
-        response = s.params(size=0).execute()
+        response = s.params(**self._aggregation_params()).execute()
         return [name.key for name in response.aggregations.exp_names.buckets]
 
     def _get_artifact_location(self, experiment_id: str) -> str:
         return append_to_uri_path(self.artifact_root_uri, str(experiment_id))
 
+    @traced
     def create_experiment(self, name: str, artifact_location: str = None) -> str:
         if name is None or name == '':
             raise MlflowException('Invalid experiment name', INVALID_PARAMETER_VALUE)
+        if self.lazy_index_init:
+            self._init_indices()
         existing_names = self._list_experiments_name()
         if name in existing_names:
             raise MlflowException('This experiment name already exists', INVALID_PARAMETER_VALUE)
 
         experiment = ElasticExperiment(name=name, lifecycle_stage=LifecycleStage.ACTIVE,
                                        artifact_location=artifact_location)
-        experiment.save(refresh=True)
+        experiment.save(using=self.using, index=self._index_name(ElasticExperiment),
+                        refresh=True)
         if not artifact_location:
             artifact_location = self._get_artifact_location(experiment.meta.id)
-        experiment.update(refresh=True, artifact_location=artifact_location)
+        experiment.update(using=self.using, index=self._index_name(ElasticExperiment),
+                          refresh=True, artifact_location=artifact_location)
         return str(experiment.meta.id)
 
     def _check_experiment_is_active(self, experiment: ElasticExperiment) -> None:
@@ -147,38 +496,52 @@ class ElasticsearchStore(AbstractStore):
 
     def _get_experiment(self, experiment_id: str) -> ElasticExperiment:
         try:
-            experiment = ElasticExperiment.get(id=experiment_id)
+            experiment = ElasticExperiment.get(using=self.using,
+                                               index=self._index_name(ElasticExperiment),
+                                               id=experiment_id)
         except NotFoundError:
             raise MlflowException(
                 "No Experiment with id={} exists".format(experiment_id), RESOURCE_DOES_NOT_EXIST
             )
         return experiment
 
+    @traced
     def get_experiment(self, experiment_id: str) -> Experiment:
         return self._get_experiment(experiment_id).to_mlflow_entity()
 
+    @traced
     def delete_experiment(self, experiment_id: str) -> None:
         experiment = self._get_experiment(experiment_id)
         if experiment.lifecycle_stage != LifecycleStage.ACTIVE:
             raise MlflowException('Cannot delete an already deleted experiment.', INVALID_STATE)
-        experiment.update(refresh=True, lifecycle_stage=LifecycleStage.DELETED)
+        experiment.update(using=self.using, index=self._index_name(ElasticExperiment),
+                          refresh=True, lifecycle_stage=LifecycleStage.DELETED)
 
+    @traced
     def restore_experiment(self, experiment_id: str) -> None:
         experiment = self._get_experiment(experiment_id)
         if experiment.lifecycle_stage != LifecycleStage.DELETED:
             raise MlflowException('Cannot restore an active experiment.', INVALID_STATE)
-        experiment.update(refresh=True, lifecycle_stage=LifecycleStage.ACTIVE)
+        experiment.update(using=self.using, index=self._index_name(ElasticExperiment),
+                          refresh=True, lifecycle_stage=LifecycleStage.ACTIVE)
 
+    @traced
     def rename_experiment(self, experiment_id: str, new_name: str) -> None:
         experiment = self._get_experiment(experiment_id)
         if experiment.lifecycle_stage != LifecycleStage.ACTIVE:
             raise MlflowException('Cannot rename a non-active experiment.', INVALID_STATE)
-        experiment.update(refresh=True, name=new_name)
+        experiment.update(using=self.using, index=self._index_name(ElasticExperiment),
+                          refresh=True, name=new_name)
 
-    def create_run(self, experiment_id: str, user_id: str,
-                   start_time: int, tags: List[RunTag]) -> Run:
+    def _new_run_id(self, experiment_id: str) -> str:
+        # With experiment routing, the run id carries the routing of the run document
         run_id = uuid.uuid4().hex
-        experiment = self._get_experiment(experiment_id)
+        if self.experiment_routing:
+            run_id = f'{run_id}-{experiment_id}'
+        return run_id
+
+    def _build_run(self, run_id: str, experiment: ElasticExperiment, experiment_id: str,
+                   user_id: str, start_time: int, tags: List[RunTag]) -> ElasticRun:
         self._check_experiment_is_active(experiment)
         artifact_location = append_to_uri_path(experiment.artifact_location, run_id,
                                                ElasticsearchStore.ARTIFACTS_FOLDER_NAME)
@@ -186,16 +549,92 @@ class ElasticsearchStore(AbstractStore):
         for tag in tags:
             tags_dict[tag.key] = tag.value
         run_tags = [ElasticTag(key=key, value=value) for key, value in tags_dict.items()]
-        run = ElasticRun(meta={'id': run_id},
+        meta = {'id': run_id}
+        if self.experiment_routing:
+            meta['routing'] = experiment_id
+        run = ElasticRun(meta=meta,
                          run_id=run_id,
                          experiment_id=experiment_id, user_id=user_id,
                          status=RunStatus.to_string(RunStatus.RUNNING),
                          start_time=start_time, end_time=None,
                          lifecycle_stage=LifecycleStage.ACTIVE, artifact_uri=artifact_location,
                          tags=run_tags)
-        run.save()
+        return run
+
+    @traced
+    def create_run(self, experiment_id: str, user_id: str,
+                   start_time: int, tags: List[RunTag]) -> Run:
+        if self.lazy_index_init:
+            self._init_indices()
+        run_id = self._new_run_id(experiment_id)
+        experiment = self._get_experiment(experiment_id)
+        run = self._build_run(run_id, experiment, experiment_id, user_id, start_time, tags)
+        run.save(using=self.using, index=self._index_name(ElasticRun))
+        self._invalidate_search_cache(experiment_id)
+        self._update_column_catalog(experiment_id, tags=[tag.key for tag in tags])
         return run.to_mlflow_entity()
 
+    def _new_catalog_columns(self, experiment_id: str, metrics: Sequence[str] = (),
+                             params: Sequence[str] = (),
+                             tags: Sequence[str] = ()) -> Dict[str, List[str]]:
+        # Keys already added to the catalog by this process are not sent again
+        columns: Dict[str, List[str]] = {}
+        if not self.column_catalog:
+            return columns
+        for column_type, keys in (("latest_metrics", metrics), ("params", params),
+                                  ("tags", tags)):
+            new_keys = sorted({key for key in keys
+                               if self._catalog_columns.get((experiment_id, column_type,
+                                                             key)) is None})
+            if new_keys:
+                columns[column_type] = new_keys
+        return columns
+
+    def _build_catalog_update_body(self, experiment_id: str,
+                                   columns: Dict[str, List[str]]) -> Dict[str, Any]:
+        upsert: Dict[str, Any] = {"experiment_id": experiment_id, "latest_metrics": [],
+                                  "params": [], "tags": []}
+        upsert.update(columns)
+        return {"script": {"source": "boolean changed = false; "
+                                     "for (entry in params.columns.entrySet()) { "
+                                     "def keys = ctx._source[entry.getKey()]; "
+                                     "if (keys == null) { keys = []; "
+                                     "ctx._source[entry.getKey()] = keys; } "
+                                     "for (key in entry.getValue()) { "
+                                     "if (!keys.contains(key)) { keys.add(key); changed = true; } "
+                                     "} } "
+                                     "if (!changed) { ctx.op = 'none'; }",
+                           "lang": "painless",
+                           "params": {"columns": columns}},
+                "upsert": upsert}
+
+    def _mark_catalog_columns(self, experiment_id: str, columns: Dict[str, List[str]]) -> None:
+        for column_type, keys in columns.items():
+            for key in keys:
+                self._catalog_columns.set((experiment_id, column_type, key), True)
+
+    def _shed_column_catalog_update(self, experiment_id: str) -> bool:
+        if self.circuit_breaker is not None and not self.circuit_breaker.is_healthy:
+            # The catalog can be rebuilt, its updates are the first writes shed under load
+            _logger.warning("Skipped the column catalog update of experiment %s, the cluster is "
+                            "rejecting requests", experiment_id)
+            return True
+        return False
+
+    def _update_column_catalog(self, experiment_id: str, metrics: Sequence[str] = (),
+                               params: Sequence[str] = (), tags: Sequence[str] = ()) -> None:
+        columns = self._new_catalog_columns(experiment_id, metrics, params, tags)
+        if not columns or self._shed_column_catalog_update(experiment_id):
+            return
+        connections.get_connection(self.using).update(
+            index=self._index_name(ElasticColumnCatalog), id=experiment_id,
+            body=self._build_catalog_update_body(experiment_id, columns), retry_on_conflict=5)
+        self._mark_catalog_columns(experiment_id, columns)
+
+    def _invalidate_search_cache(self, experiment_id: str) -> None:
+        if self.search_cache is not None:
+            self.search_cache.bump_generation(str(experiment_id))
+
     def _check_run_is_active(self, run: ElasticRun) -> None:
         if run.lifecycle_stage != LifecycleStage.ACTIVE:
             raise MlflowException("The run {} must be in the 'active' state. Current state is {}."
@@ -208,12 +647,16 @@ class ElasticsearchStore(AbstractStore):
                                   .format(run.meta.id, run.lifecycle_stage),
                                   INVALID_PARAMETER_VALUE)
 
+    @traced
     def update_run_info(self, run_id: str, run_status: RunStatus, end_time: int) -> RunInfo:
         run = self._get_run(run_id)
         self._check_run_is_active(run)
-        run.update(status=RunStatus.to_string(run_status), end_time=end_time)
+        run.update(using=self.using, index=self._index_name(ElasticRun),
+                   status=RunStatus.to_string(run_status), end_time=end_time)
+        self._invalidate_search_cache(run.experiment_id)
         return run.to_mlflow_entity()._info
 
+    @traced
     def get_run(self, run_id: str) -> Run:
         try:
             run = self._get_run(run_id=run_id)
@@ -223,19 +666,56 @@ class ElasticsearchStore(AbstractStore):
             )
         return run.to_mlflow_entity()
 
+    def _cached_run_routing(self, run_id: str) -> str:
+        if len(run_id) > 33 and run_id[32] == "-":
+            return run_id[33:]
+        return self._run_routing_cache.get(run_id)
+
+    def _build_run_routing_search(self, run_id: str) -> Search:
+        return Search(using=self.using, index=self._index_name(ElasticRun)) \
+            .filter("ids", values=[run_id]).source(False).params(size=1)
+
+    def _resolve_run_routing(self, run_id: str, response: Response) -> str:
+        # Runs without a routing in their id were either migrated with their experiment routing
+        # or are still stored with the default routing
+        if len(response.hits) == 0 or "routing" not in response.hits[0].meta:
+            return None
+        routing = response.hits[0].meta.routing
+        self._run_routing_cache.set(run_id, routing)
+        return routing
+
     def _get_run(self, run_id: str) -> ElasticRun:
-        run = ElasticRun.get(id=run_id)
-        return run
+        if not self.experiment_routing:
+            return ElasticRun.get(using=self.using, index=self._index_name(ElasticRun),
+                                  id=run_id)
+        routing = self._cached_run_routing(run_id)
+        if routing is None:
+            routing = self._resolve_run_routing(run_id, self._execute_search(
+                "get_run", self._build_run_routing_search(run_id)))
+        try:
+            return ElasticRun.get(using=self.using, index=self._index_name(ElasticRun),
+                                  id=run_id, routing=routing)
+        except NotFoundError:
+            if routing is None:
+                raise
+            return ElasticRun.get(using=self.using, index=self._index_name(ElasticRun),
+                                  id=run_id, routing=None)
 
+    @traced
     def delete_run(self, run_id: str) -> None:
         run = self._get_run(run_id)
         self._check_run_is_active(run)
-        run.update(lifecycle_stage=LifecycleStage.DELETED)
+        run.update(using=self.using, index=self._index_name(ElasticRun),
+                   lifecycle_stage=LifecycleStage.DELETED)
+        self._invalidate_search_cache(run.experiment_id)
 
+    @traced
     def restore_run(self, run_id: str) -> None:
         run = self._get_run(run_id)
         self._check_run_is_deleted(run)
-        run.update(lifecycle_stage=LifecycleStage.ACTIVE)
+        run.update(using=self.using, index=self._index_name(ElasticRun),
+                   lifecycle_stage=LifecycleStage.ACTIVE)
+        self._invalidate_search_cache(run.experiment_id)
 
     @staticmethod
     def _update_latest_metric_if_necessary(new_metric: ElasticMetric, run: ElasticRun) -> None:
@@ -256,7 +736,7 @@ class ElasticsearchStore(AbstractStore):
         if not (latest_metric_exist):
             run.latest_metrics.append(new_latest_metric)
 
-    def _log_metric(self, run: ElasticRun, metric: Metric) -> None:
+    def _build_metric(self, run: ElasticRun, metric: Metric) -> ElasticMetric:
         _validate_metric(metric.key, metric.value, metric.timestamp, metric.step)
         is_nan = math.isnan(metric.value)
         if is_nan:
@@ -271,14 +751,89 @@ class ElasticsearchStore(AbstractStore):
                                    step=metric.step,
                                    is_nan=is_nan,
                                    run_id=run.run_id)
+        if self.metric_run_routing:
+            new_metric.meta.routing = run.run_id
         self._update_latest_metric_if_necessary(new_metric, run)
-        new_metric.save()
+        if self.metric_sort_fields:
+            self._update_metric_sort_field(run, metric.key)
+        return new_metric
+
+    def _update_metric_sort_field(self, run: ElasticRun, key: str) -> None:
+        for latest_metric in run.latest_metrics:
+            if latest_metric.key == key:
+                run.metric_sort[metric_sort_key(key)] = latest_metric.value
+
+    @traced
+    def backfill_metric_sort_fields(self, experiment_id: str = None) -> None:
+        ubq = UpdateByQuery(using=self.using, index=self._index_name(ElasticRun))
+        if experiment_id is not None:
+            ubq = ubq.filter("term", experiment_id=experiment_id)
+        ubq.script(source="if (ctx._source.metric_sort == null) "
+                          "{ ctx._source.metric_sort = [:]; } "
+                          "if (ctx._source.latest_metrics != null) "
+                          "{ for (m in ctx._source.latest_metrics) "
+                          "{ ctx._source.metric_sort[m.key.replace('.', '%2E')] = m.value; } }") \
+            .params(conflicts="proceed").execute()
+
+    def _log_metric(self, run: ElasticRun, metric: Metric) -> None:
+        self._build_metric(run, metric).save(using=self.using,
+                                             index=self._index_name(ElasticMetric))
+
+    def _build_bulk_body(self, documents: List[Any]) -> List[Dict[str, Any]]:
+        body: List[Dict[str, Any]] = []
+        for document in documents:
+            action = {"_index": self._index_name(type(document))}
+            if "routing" in document.meta:
+                action["routing"] = document.meta.routing
+            body += [{"index": action}, document.to_dict()]
+        return body
 
+    def _rejected_documents(self, documents: List[Any], response: Dict[str, Any]) -> List[Any]:
+        if not response["errors"]:
+            return []
+        rejected = []
+        for document, item in zip(documents, response["items"]):
+            status = item["index"]["status"]
+            error = item["index"].get("error")
+            if is_retryable_status(status, error.get("type") if isinstance(error, dict) else error):
+                rejected.append(document)
+            elif status >= 300:
+                raise MlflowException(f'Failed to index a document in {item["index"]["_index"]}'
+                                      f': {item["index"].get("error")}', INTERNAL_ERROR)
+        return rejected
+
+    def _bulk_retry_delay(self, delays: Iterator[float], rejected: List[Any]) -> float:
+        delay = next(delays, None)
+        if delay is None:
+            raise MlflowException(f'{len(rejected)} documents were rejected by the cluster',
+                                  REQUEST_LIMIT_EXCEEDED)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_rejection()
+        return delay
+
+    def _bulk_index(self, documents: List[Any]) -> None:
+        # Only the documents rejected by the cluster are sent again, after a backoff
+        delays = backoff_delays(self.backoff_retries, self.backoff_initial, self.backoff_max)
+        while documents:
+            response = connections.get_connection(self.using).bulk(
+                body=self._build_bulk_body(documents))
+            documents = self._rejected_documents(documents, response)
+            if documents:
+                time.sleep(self._bulk_retry_delay(delays, documents))
+
+    @traced
     def log_metric(self, run_id: str, metric: Metric) -> None:
         run = self._get_run(run_id=run_id)
         self._check_run_is_active(run)
         self._log_metric(run, metric)
-        run.update(latest_metrics=run.latest_metrics)
+        if self.metric_sort_fields:
+            run.update(using=self.using, index=self._index_name(ElasticRun),
+                       latest_metrics=run.latest_metrics, metric_sort=run.metric_sort)
+        else:
+            run.update(using=self.using, index=self._index_name(ElasticRun),
+                       latest_metrics=run.latest_metrics)
+        self._invalidate_search_cache(run.experiment_id)
+        self._update_column_catalog(run.experiment_id, metrics=[metric.key])
 
     def _log_param(self, run: ElasticRun, param: Param) -> None:
         _validate_param(param.key, param.value)
@@ -286,19 +841,24 @@ class ElasticsearchStore(AbstractStore):
                                  value=param.value)
         run.params.append(new_param)
 
+    @traced
     def log_param(self, run_id: str, param: Param) -> None:
         run = self._get_run(run_id=run_id)
         self._check_run_is_active(run)
         self._log_param(run, param)
-        run.update(params=run.params)
+        run.update(using=self.using, index=self._index_name(ElasticRun), params=run.params)
+        self._invalidate_search_cache(run.experiment_id)
+        self._update_column_catalog(run.experiment_id, params=[param.key])
 
+    @traced
     def set_experiment_tag(self, experiment_id: str, tag: ExperimentTag) -> None:
         _validate_experiment_tag(tag.key, tag.value)
         experiment = self._get_experiment(experiment_id)
         self._check_experiment_is_active(experiment)
         new_tag = ElasticExperimentTag(key=tag.key, value=tag.value)
         experiment.tags.append(new_tag)
-        experiment.update(tags=experiment.tags)
+        experiment.update(using=self.using, index=self._index_name(ElasticExperiment),
+                          tags=experiment.tags)
 
     def _set_tag(self, run: ElasticRun, tag: RunTag) -> None:
         _validate_tag(tag.key, tag.value)
@@ -306,50 +866,117 @@ class ElasticsearchStore(AbstractStore):
                              value=tag.value)
         run.tags.append(new_tag)
 
+    @traced
     def set_tag(self, run_id: str, tag: RunTag) -> None:
         run = self._get_run(run_id=run_id)
         self._check_run_is_active(run)
         self._set_tag(run, tag)
-        run.update(tags=run.tags)
+        run.update(using=self.using, index=self._index_name(ElasticRun), tags=run.tags)
+        self._invalidate_search_cache(run.experiment_id)
+        self._update_column_catalog(run.experiment_id, tags=[tag.key])
+
+    def _build_metric_history_search(self, run_id: str, metric_key: str) -> Search:
+        s = Search(using=self.read_using, index=self._index_name(ElasticMetric)) \
+            .filter("term", run_id=run_id).filter("term", key=metric_key)
+        if self.metric_run_routing:
+            s = s.params(routing=run_id)
+        if self.metric_doc_values:
+            # Columnar reads of the doc values, without loading and parsing the _source
+            s = s.source(False).extra(docvalue_fields=METRIC_DOC_VALUE_FIELDS)
+        return s
 
+    @traced
     def get_metric_history(self, run_id: str, metric_key: str) -> List[Metric]:
-        s = Search(index="mlflow-metrics").filter("term", run_id=run_id) \
-            .filter("term", key=metric_key)
+        s = self._apply_search_limits("get_metric_history",
+                                      self._build_metric_history_search(run_id, metric_key))
+        request_timeout = self._request_timeout("get_metric_history")
+        if request_timeout is not None:
+            s = s.params(request_timeout=request_timeout)
+        if self.metric_doc_values:
+            return [self._doc_values_to_mlflow_metric(m.to_dict()) for m in s.scan()]
         return [self._hit_to_mlflow_metric(m) for m in s.scan()]
 
-    def _list_columns(self, experiment_id: str, stages: List[LifecycleStage],
-                      column_type: str, columns: List[str], size: int = 100) -> None:
-        s = Search(index="mlflow-runs").filter("match", experiment_id=experiment_id) \
+    def _build_list_columns_search(self, experiment_id: str, stages: List[LifecycleStage],
+                                   pages: Dict[str, Tuple[int, Any]]) -> Search:
+        s = Search(using=self.read_using, index=self._index_name(ElasticRun)) \
+            .filter("match", experiment_id=experiment_id) \
             .filter("terms", lifecycle_stage=stages)
-        s.aggs.bucket(column_type, 'nested', path=column_type) \
-            .bucket(f'{column_type}_keys', "composite", size=size,
-                    sources=[{"key": {"terms": {"field": f'{column_type}.key'}}}])
-        response = s.params(size=0).execute()
-        new_columns = [column.key.key for column in attrgetter(
-            f'aggregations.{column_type}.{column_type}_keys.buckets')(response)]
-        columns += new_columns
-        while (len(new_columns) == size):
-            last_col = attrgetter(
-                f'aggregations.{column_type}.{column_type}_keys.after_key.key')(response)
-            s = Search(index="mlflow-runs").filter("match", experiment_id=experiment_id) \
-                .filter("terms", lifecycle_stage=stages)
+        for column_type, (size, after) in pages.items():
+            composite: Dict[str, Any] = {"size": size,
+                                         "sources": [{"key": {"terms": {
+                                             "field": f'{column_type}.key'}}}]}
+            if after is not None:
+                composite["after"] = {"key": after}
             s.aggs.bucket(column_type, 'nested', path=column_type) \
-                .bucket(f'{column_type}_keys', "composite", size=size,
-                        sources=[{"key": {"terms": {"field": f'{column_type}.key'}}}],
-                        after={"key": last_col})
-            response = s.params(size=0).execute()
-            new_columns = [column.key.key for column in attrgetter(
-                f'aggregations.{column_type}.{column_type}_keys.buckets')(response)]
-            columns += new_columns
+                .bucket(f'{column_type}_keys', "composite", **composite)
+        if self.experiment_routing:
+            s = s.params(routing=experiment_id)
+        return s.params(**self._aggregation_params(experiment_id))
 
-    def list_all_columns(self, experiment_id: str, run_view_type: str) -> 'Columns':
+    def _next_list_columns_pages(self, pages: Dict[str, Tuple[int, Any]], response: Response,
+                                 columns: Dict[str, List[str]]) -> Dict[str, Tuple[int, Any]]:
+        # A full page announces more columns, the next page of this type is twice as large
+        next_pages: Dict[str, Tuple[int, Any]] = {}
+        if "aggregations" not in response:
+            # No index was searched
+            return next_pages
+        for column_type, (size, _) in pages.items():
+            composite = attrgetter(f'aggregations.{column_type}.{column_type}_keys')(response)
+            columns[column_type] += [column.key.key for column in composite.buckets]
+            if len(composite.buckets) == size:
+                next_pages[column_type] = (min(size * 2, self.columns_max_page_size),
+                                           composite.after_key.key)
+        return self._limit_list_columns_pages(next_pages)
+
+    def _first_list_columns_pages(self) -> Dict[str, Tuple[int, Any]]:
+        return self._limit_list_columns_pages({column_type: (self.columns_page_size, None)
+                                               for column_type in ("latest_metrics", "params",
+                                                                   "tags")})
+
+    def _limit_list_columns_pages(
+            self, pages: Dict[str, Tuple[int, Any]]) -> Dict[str, Tuple[int, Any]]:
+        # The pages of one request share the bucket budget in proportion to their size
+        total = sum(size for size, _ in pages.values())
+        if total <= LIST_COLUMNS_MAX_BUCKETS:
+            return pages
+        return {column_type: (max(1, size * LIST_COLUMNS_MAX_BUCKETS // total), after)
+                for column_type, (size, after) in pages.items()}
+
+    def _aggregate_columns(self, experiment_id: str,
+                           stages: List[LifecycleStage]) -> Dict[str, List[str]]:
         columns: Dict[str, List[str]] = {"latest_metrics": [],
                                          "params": [],
                                          "tags": []}
-        stages = LifecycleStage.view_type_to_stages(run_view_type)
-        for column_type in ['latest_metrics', 'params', 'tags']:
-            self._list_columns(experiment_id, stages, column_type,
-                               columns[column_type])
+        pages = self._first_list_columns_pages()
+        while pages:
+            response = self._execute_search("list_all_columns", self._build_list_columns_search(
+                experiment_id, stages, pages))
+            pages = self._next_list_columns_pages(pages, response, columns)
+        return columns
+
+    @traced
+    def rebuild_column_catalog(self, experiment_id: str) -> Dict[str, List[str]]:
+        columns = self._aggregate_columns(experiment_id,
+                                          LifecycleStage.view_type_to_stages(ViewType.ALL))
+        connections.get_connection(self.using).update(
+            index=self._index_name(ElasticColumnCatalog), id=experiment_id,
+            body=self._build_catalog_update_body(experiment_id, columns), retry_on_conflict=5)
+        return columns
+
+    @traced
+    def list_all_columns(self, experiment_id: str, run_view_type: str) -> 'Columns':
+        if not self.column_catalog:
+            columns = self._aggregate_columns(
+                experiment_id, LifecycleStage.view_type_to_stages(run_view_type))
+        else:
+            try:
+                catalog = ElasticColumnCatalog.get(using=self.read_using,
+                                                   index=self._index_name(ElasticColumnCatalog),
+                                                   id=experiment_id)
+                columns = {column_type: list(getattr(catalog, column_type))
+                           for column_type in ("latest_metrics", "params", "tags")}
+            except NotFoundError:
+                columns = self.rebuild_column_catalog(experiment_id)
         return Columns(metrics=columns['latest_metrics'],
                        params=columns['params'],
                        tags=columns['tags'])
@@ -378,20 +1005,22 @@ class ElasticsearchStore(AbstractStore):
                 "=": value,
                 "!=": value,
                 "<=": {'lte': value},
-                "<": {'lt': value}
+                "<": {'lt': value},
+                "IN": value
             }
+            if key_type == "attribute" and key_name == "run_name":
+                key_type, key_name = "tag", MLFLOW_RUN_NAME
+            if key_type == "attribute":
+                search_query.append(self._build_attribute_query(key_name, comparator,
+                                                                filter_ops[comparator]))
+                continue
+            query_type = Q("term", **{f'{type_dict[key_type]}__key': key_name})
             if comparator in ["LIKE", "ILIKE"]:
-                filter_ops[comparator] = f'*{value.split("%")[1]}*'
-            if key_type == "parameter":
-                query_type = Q("term", params__key=key_name)
-                query_val = Q(self.filter_key[comparator][0], params__value=filter_ops[comparator])
-            elif key_type == "tag":
-                query_type = Q("term", tags__key=key_name)
-                query_val = Q(self.filter_key[comparator][0], tags__value=filter_ops[comparator])
-            elif key_type == "metric":
-                query_type = Q("term", latest_metrics__key=key_name)
+                query_val = self._build_like_query(f'{type_dict[key_type]}__value', value,
+                                                   comparator == "ILIKE", self.like_subfields)
+            else:
                 query_val = Q(self.filter_key[comparator][0],
-                              latest_metrics__value=filter_ops[comparator])
+                              **{f'{type_dict[key_type]}__value': filter_ops[comparator]})
             if self.filter_key[comparator][1] == "must_not":
                 query = Q('bool', filter=[query_type], must_not=[query_val])
             else:
@@ -399,15 +1028,45 @@ class ElasticsearchStore(AbstractStore):
             search_query.append(Q('nested', path=type_dict[key_type], query=query))
         return search_query
 
+    def _build_like_query(self, field: str, pattern: str, case_insensitive: bool,
+                          use_subfields: bool) -> Q:
+        wildcard = ElasticsearchSearchUtils.like_to_wildcard(pattern)
+        if case_insensitive and use_subfields and not wildcard.startswith(("*", "?")):
+            return Q("wildcard", **{f'{field}__lower': wildcard.lower()})
+        if use_subfields:
+            field = f'{field}__wildcard'
+        if case_insensitive:
+            return Q("regexp", **{
+                field: ElasticsearchSearchUtils.like_to_case_insensitive_regexp(pattern)})
+        return Q("wildcard", **{field: wildcard})
+
+    def _build_attribute_query(self, key_name: str, comparator: str, value: Any) -> Q:
+        is_numeric = key_name in ElasticsearchSearchUtils.NUMERIC_ATTRIBUTES
+        if key_name not in self.attribute_fields or \
+                (is_numeric and comparator in ["LIKE", "ILIKE", "IN"]) or \
+                (not is_numeric and self.filter_key[comparator][0] == "range"):
+            raise MlflowException("Filtering on attribute '{}' with '{}' is not supported"
+                                  .format(key_name, comparator), INVALID_PARAMETER_VALUE)
+        if comparator in ["LIKE", "ILIKE"]:
+            return self._build_like_query(key_name, value, comparator == "ILIKE", False)
+        query = Q(self.filter_key[comparator][0], **{key_name: value})
+        if self.filter_key[comparator][1] == "must_not":
+            return Q('bool', must_not=[query])
+        return query
+
     def _get_orderby_clauses(self, order_by_list: List[str]) -> List[dict]:
         type_dict = {"metric": "latest_metrics", "parameter": "params", "tag": "tags"}
-        sort_clauses = []
+        sort_clauses: List[dict] = []
         if order_by_list:
             for order_by_clause in order_by_list:
                 (key_type, key, ascending) = SearchUtils. \
                     parse_order_by_for_search_runs(order_by_clause)
                 sort_order = "asc" if ascending else "desc"
-                if not SearchUtils.is_attribute(key_type, "="):
+                if key_type == "metric" and self.metric_sort_fields:
+                    # The field is only mapped once a run logged the metric
+                    sort_clauses.append({f'metric_sort.{metric_sort_key(key)}':
+                                         {'order': sort_order, "unmapped_type": "double"}})
+                elif not SearchUtils.is_attribute(key_type, "="):
                     key_type = type_dict[key_type]
                     sort_clauses.append({f'{key_type}.value':
                                          {'order': sort_order, "nested":
@@ -419,40 +1078,138 @@ class ElasticsearchStore(AbstractStore):
         sort_clauses.append({"run_id": {'order': "asc"}})
         return sort_clauses
 
+    def _build_search_cache_key(self, experiment_ids: List[str], filter_string: str,
+                                run_view_type: str, max_results: int, order_by: List[str],
+                                page_token: str, columns_to_whitelist: List[str]) -> Hashable:
+        generations = tuple((str(exp_id), self.search_cache.get_generation(str(exp_id)))
+                            for exp_id in experiment_ids)
+        return (generations, filter_string, run_view_type, max_results,
+                tuple(order_by) if order_by else None, page_token or None,
+                tuple(columns_to_whitelist) if columns_to_whitelist is not None else None)
+
+    def _is_search_cacheable(self, experiment_ids: List[str]) -> bool:
+        # A page searched before the last writes are refreshed would be cached stale
+        for experiment_id in experiment_ids:
+            elapsed = self.search_cache.seconds_since_bump(str(experiment_id))
+            if elapsed is not None and elapsed < self.search_cache_settle_time:
+                return False
+        return True
+
+    @traced
     def _search_runs(self, experiment_ids: List[str], filter_string: str,
                      run_view_type: str, max_results: int = SEARCH_MAX_RESULTS_DEFAULT,
                      order_by: List[str] = None, page_token: str = None,
                      columns_to_whitelist: List[str] = None) -> Tuple[List[Run], str]:
 
+        cache_key = None
+        if self.search_cache is not None:
+            cache_key = self._build_search_cache_key(experiment_ids, filter_string, run_view_type,
+                                                     max_results, order_by, page_token,
+                                                     columns_to_whitelist)
+            cached_page = self.search_cache.get(cache_key)
+            if cached_page is not None:
+                return cached_page
+            if not self._is_search_cacheable(experiment_ids):
+                cache_key = None
+        s = self._build_search_runs_search(experiment_ids, filter_string, run_view_type,
+                                           max_results, order_by, page_token)
+        runs, next_page_token = self._to_search_runs_page(
+            self._execute_search("search_runs", s), max_results, columns_to_whitelist)
+        if cache_key is not None:
+            self.search_cache.set(cache_key, (runs, next_page_token))
+        return runs, next_page_token
+
+    @traced
+    def search_runs_many(self, queries: List[Dict[str, Any]]) -> List[PagedList]:
+        searches = []
+        for query in queries:
+            search_args: Dict[str, Any] = {"filter_string": "",
+                                           "run_view_type": ViewType.ACTIVE_ONLY,
+                                           "max_results": SEARCH_MAX_RESULTS_DEFAULT,
+                                           "order_by": None,
+                                           "page_token": None,
+                                           "columns_to_whitelist": None}
+            search_args.update(query)
+            searches.append(search_args)
+        pages: List[Tuple[List[Run], str]] = [None] * len(searches)
+        cache_keys: List[Hashable] = [None] * len(searches)
+        ms = MultiSearch(using=self.read_using, index=self._index_name(ElasticRun))
+        pending: List[Tuple[int, Search]] = []
+        for i, search_args in enumerate(searches):
+            if self.search_cache is not None:
+                cache_keys[i] = self._build_search_cache_key(**search_args)
+                pages[i] = self.search_cache.get(cache_keys[i])
+                if pages[i] is not None:
+                    continue
+                if not self._is_search_cacheable(search_args["experiment_ids"]):
+                    cache_keys[i] = None
+            search_args = dict(search_args)
+            del search_args["columns_to_whitelist"]
+            s = self._sample_profile(self._apply_search_limits(
+                "search_runs", self._build_search_runs_search(**search_args)))
+            ms = ms.add(s)
+            pending.append((i, s))
+        if pending:
+            request_timeout = self._request_timeout("search_runs")
+            if request_timeout is not None:
+                ms = ms.params(request_timeout=request_timeout)
+            start = time.monotonic()
+            responses = ms.execute()
+            elapsed = time.monotonic() - start
+            for (i, s), response in zip(pending, responses):
+                self._log_search("search_runs_many", s, response, elapsed)
+                self._check_partial_results("search_runs_many", response)
+                pages[i] = self._to_search_runs_page(response, searches[i]["max_results"],
+                                                     searches[i]["columns_to_whitelist"])
+                if cache_keys[i] is not None:
+                    self.search_cache.set(cache_keys[i], pages[i])
+        return [PagedList(runs, token) for runs, token in pages]
+
+    def _build_search_runs_search(self, experiment_ids: List[str], filter_string: str,
+                                  run_view_type: str, max_results: int,
+                                  order_by: List[str] = None, page_token: str = None) -> Search:
         if max_results > 10000:
             raise MlflowException("Invalid value for request parameter max_results. It must be at "
                                   "most {}, but got value {}"
                                   .format(10000, max_results),
                                   INVALID_PARAMETER_VALUE)
         stages = LifecycleStage.view_type_to_stages(run_view_type)
-        parsed_filters = SearchUtils.parse_search_filter(filter_string)
+        parsed_filters = ElasticsearchSearchUtils.parse_search_filter(filter_string)
         filter_queries = [Q("match", experiment_id=experiment_ids[0]),
                           Q("terms", lifecycle_stage=stages)]
         filter_queries += self._build_elasticsearch_query(parsed_filters)
         sort_clauses = self._get_orderby_clauses(order_by)
-        s = Search(index="mlflow-runs").query('bool', filter=filter_queries)
+        s = Search(using=self.read_using, index=self._index_name(ElasticRun)) \
+            .query('bool', filter=filter_queries)
         s = s.sort(*sort_clauses)
         if page_token != "" and page_token is not None:
             s = s.extra(search_after=ast.literal_eval(page_token))
-        response = s.params(size=max_results).execute()
+        if self.experiment_routing:
+            s = s.params(routing=experiment_ids[0])
+        # In the body, the parameters of a search end up in the msearch header of search_runs_many
+        return s.extra(size=max_results)
+
+    def _to_search_runs_page(self, response: Response, max_results: int,
+                             columns_to_whitelist: List[str] = None) -> Tuple[List[Run], str]:
         columns_to_whitelist_key_dict = self._build_columns_to_whitelist_key_dict(
             columns_to_whitelist)
-        runs = [self._hit_to_mlflow_run(hit, columns_to_whitelist_key_dict) for hit in response]
+        hits = response.to_dict()["hits"]["hits"]
+        runs = [self._source_to_mlflow_run(hit["_source"], columns_to_whitelist_key_dict)
+                for hit in hits]
         if len(runs) == max_results:
-            next_page_token = response.hits.hits[-1].sort
+            next_page_token = hits[-1]["sort"]
         else:
             next_page_token = []
         return runs, str(next_page_token)
 
+    @traced
     def update_artifacts_location(self, run_id: str, new_artifacts_location: str) -> None:
         run = self._get_run(run_id=run_id)
-        run.update(artifact_uri=new_artifacts_location)
+        run.update(using=self.using, index=self._index_name(ElasticRun),
+                   artifact_uri=new_artifacts_location)
+        self._invalidate_search_cache(run.experiment_id)
 
+    @traced
     def log_batch(self, run_id: str, metrics: List[Metric],
                   params: List[Param], tags: List[RunTag]) -> None:
         _validate_run_id(run_id)
@@ -461,14 +1218,23 @@ class ElasticsearchStore(AbstractStore):
         run = self._get_run(run_id=run_id)
         self._check_run_is_active(run)
         try:
-            for metric in metrics:
-                self._log_metric(run, metric)
+            self._bulk_index([self._build_metric(run, metric) for metric in metrics])
             for param in params:
                 self._log_param(run, param)
             for tag in tags:
                 self._set_tag(run, tag)
-            run.save()
+            run.save(using=self.using, index=self._index_name(ElasticRun))
+            self._update_column_catalog(run.experiment_id,
+                                        metrics=[metric.key for metric in metrics],
+                                        params=[param.key for param in params],
+                                        tags=[tag.key for tag in tags])
         except MlflowException as e:
             raise e
+        except CircuitBreakerOpenError as e:
+            raise MlflowException(e, TEMPORARILY_UNAVAILABLE)
+        except TransportError as e:
+            raise MlflowException(e, REQUEST_LIMIT_EXCEEDED if is_retryable(e) else INTERNAL_ERROR)
         except Exception as e:
             raise MlflowException(e, INTERNAL_ERROR)
+        finally:
+            self._invalidate_search_cache(run.experiment_id)
@@ -0,0 +1,58 @@
+from typing import Any, Dict, List
+
+from mlflow.entities import Metric, Param, Run, RunData, RunInfo, RunTag
+
+
+def source_to_run_data(source: Dict[str, Any],
+                       columns_to_whitelist_key_dict: dict = None) -> RunData:
+    if columns_to_whitelist_key_dict is None:
+        metrics_keys = params_keys = tags_keys = None
+    else:
+        metrics_keys = columns_to_whitelist_key_dict["metrics"]
+        params_keys = columns_to_whitelist_key_dict["params"]
+        tags_keys = columns_to_whitelist_key_dict["tags"]
+    metrics = [Metric(m["key"], float("nan") if m.get("is_nan") else m["value"],
+                      m["timestamp"], m["step"])
+               for m in source.get("latest_metrics") or ()
+               if metrics_keys is None or m["key"] in metrics_keys]
+    params = [Param(p["key"], p["value"]) for p in source.get("params") or ()
+              if params_keys is None or p["key"] in params_keys]
+    tags = [RunTag(t["key"], t["value"]) for t in source.get("tags") or ()
+            if tags_keys is None or t["key"] in tags_keys]
+    return RunData(metrics=metrics, params=params, tags=tags)
+
+
+class LazyRun(Run):
+    """Run whose RunData is only built on first access, from the run document it was read from.
+
+    Listings that only read `run.info` skip the creation of the metrics, params and tags.
+    The raw `_source` is kept instead of a callback so that the run stays picklable.
+    """
+
+    def __init__(self, run_info: RunInfo, source: Dict[str, Any],
+                 columns_to_whitelist_key_dict: dict = None) -> None:
+        self._source = source
+        self._columns_to_whitelist_key_dict = columns_to_whitelist_key_dict
+        self._run_data: RunData = None
+        super(LazyRun, self).__init__(run_info, None)
+
+    @property
+    def _data(self) -> RunData:
+        # Cached runs are shared between threads, which may build the same RunData concurrently
+        run_data = self._run_data
+        if run_data is None:
+            source = self._source
+            if source is None:
+                return self._run_data
+            run_data = source_to_run_data(source, self._columns_to_whitelist_key_dict)
+            self._run_data = run_data
+            self._source = None
+        return run_data
+
+    @_data.setter
+    def _data(self, run_data: RunData) -> None:
+        self._run_data = run_data
+
+    @classmethod
+    def _properties(cls) -> List[str]:
+        return Run._properties()
@@ -0,0 +1,51 @@
+import os
+import json
+from typing import Any, Dict, Mapping
+
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import INVALID_PARAMETER_VALUE
+
+from mlflow_elasticsearchstore.models import INDEX_DOCUMENTS
+
+INDEX_SETTINGS = {"number_of_shards": "number_of_shards",
+                  "number_of_replicas": "number_of_replicas",
+                  "refresh_interval": "refresh_interval",
+                  "translog_durability": "translog.durability"}
+INDEX_SETTINGS_FILE_ENV = "MLFLOW_ELASTICSEARCHSTORE_INDEX_SETTINGS_FILE"
+ENV_PREFIX = "MLFLOW_ELASTICSEARCHSTORE_"
+
+
+def _read_settings_file(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path) as settings_file:
+        file_settings = json.load(settings_file)
+    for index, settings in file_settings.items():
+        unknown = set(settings) - set(INDEX_SETTINGS) if index in INDEX_DOCUMENTS else {index}
+        if unknown:
+            raise MlflowException(f'Unknown index settings in {path}: {", ".join(unknown)}',
+                                  INVALID_PARAMETER_VALUE)
+    return file_settings
+
+
+def load_index_settings(store_options: Mapping[str, str],
+                        environ: Mapping[str, str] = os.environ) -> Dict[str, Dict[str, Any]]:
+    """Returns the settings given to each index on its creation, by index type.
+
+    The `<index>_<setting>` options of the store uri take precedence over the
+    `MLFLOW_ELASTICSEARCHSTORE_<INDEX>_<SETTING>` environment variables, which take precedence
+    over the json file given by the `index_settings_file` option or the
+    `MLFLOW_ELASTICSEARCHSTORE_INDEX_SETTINGS_FILE` environment variable.
+    """
+    index_settings: Dict[str, Dict[str, Any]] = {index: {} for index in INDEX_DOCUMENTS}
+    path = store_options.get("index_settings_file", environ.get(INDEX_SETTINGS_FILE_ENV))
+    if path is not None:
+        for index, settings in _read_settings_file(path).items():
+            index_settings[index].update(settings)
+    for index, settings in index_settings.items():
+        for setting in INDEX_SETTINGS:
+            option = f'{index}_{setting}'
+            if option in store_options:
+                settings[setting] = store_options[option]
+            elif ENV_PREFIX + option.upper() in environ:
+                settings[setting] = environ[ENV_PREFIX + option.upper()]
+    return {index: {INDEX_SETTINGS[setting]: value for setting, value in settings.items()}
+            for index, settings in index_settings.items()}
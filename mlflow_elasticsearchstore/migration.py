@@ -0,0 +1,254 @@
+import time
+import logging
+import argparse
+from typing import Any, Dict, List
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl import connections
+from six.moves import urllib
+
+from mlflow.entities import ViewType
+
+from mlflow_elasticsearchstore.backpressure import (DEFAULT_BACKOFF_INITIAL, DEFAULT_BACKOFF_MAX,
+                                                    DEFAULT_BACKOFF_RETRIES, max_backoff_time)
+from mlflow_elasticsearchstore.elasticsearch_store import ElasticsearchStore, _parse_bool
+from mlflow_elasticsearchstore.index_settings import load_index_settings
+from mlflow_elasticsearchstore.models import (ElasticMetric, ElasticRun, ElasticColumnCatalog,
+                                              INDEX_DOCUMENTS, DEFAULT_INDEX_PREFIX,
+                                              METRIC_DOC_VALUE_FIELDS,
+                                              index_name, like_subfields_mappings,
+                                              versioned_index_name)
+
+_logger = logging.getLogger(__name__)
+
+# Writes are blocked at most as long as the store retries them with its default backoff
+DEFAULT_MAX_BLOCK_TIME = max_backoff_time(DEFAULT_BACKOFF_RETRIES, DEFAULT_BACKOFF_INITIAL,
+                                          DEFAULT_BACKOFF_MAX)
+
+
+class TaskTimeoutError(RuntimeError):
+    pass
+
+
+def wait_for_task(es: Elasticsearch, task_id: str, poll_interval: float = 5.,
+                  timeout: float = None) -> Dict[str, Any]:
+    start = time.monotonic()
+    while True:
+        task = es.tasks.get(task_id=task_id)
+        if task["completed"]:
+            failures = task.get("response", {}).get("failures")
+            if task.get("error") or failures:
+                raise RuntimeError(f'Task {task_id} failed: {task.get("error") or failures}')
+            return task["response"]
+        if timeout is not None and time.monotonic() - start >= timeout:
+            es.tasks.cancel(task_id=task_id)
+            raise TaskTimeoutError(f'Task {task_id} did not complete in {timeout} s')
+        status = task["task"]["status"]
+        _logger.info("Task %s: %s/%s documents", task_id,
+                     status.get("created", 0) + status.get("updated", 0), status.get("total"))
+        time.sleep(poll_interval)
+
+
+def reindex(es: Elasticsearch, source: str, dest: str, script: str = None,
+            slices: Any = "auto", poll_interval: float = 5.,
+            external_versions: bool = False, query: Dict[str, Any] = None,
+            timeout: float = None) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"source": {"index": source}, "dest": {"index": dest}}
+    if query is not None:
+        body["source"]["query"] = query
+    if script is not None:
+        body["script"] = {"source": script, "lang": "painless"}
+    if external_versions:
+        # The documents keep their version, those already copied and unchanged are skipped
+        body["dest"]["version_type"] = "external"
+        body["conflicts"] = "proceed"
+    task_id = es.reindex(body=body, slices=slices, refresh=True,
+                         wait_for_completion=False)["task"]
+    return wait_for_task(es, task_id, poll_interval, timeout)
+
+
+def seq_no_checkpoint(es: Elasticsearch, index: str) -> int:
+    """Lowest max sequence number of the primary shards of `index`.
+
+    Sequence numbers are per shard, every document written after the checkpoint has a greater
+    one, whatever its shard.
+    """
+    stats = es.indices.stats(index=index, level="shards",
+                             filter_path="indices.*.shards.*.routing.primary,"
+                                         "indices.*.shards.*.seq_no.max_seq_no")
+    return min([shard["seq_no"]["max_seq_no"]
+                for index_stats in stats.get("indices", {}).values()
+                for shard_copies in index_stats["shards"].values()
+                for shard in shard_copies if shard["routing"]["primary"]], default=-1)
+
+
+def _changed_since(checkpoint: int) -> Dict[str, Any]:
+    return {"range": {"_seq_no": {"gt": checkpoint}}}
+
+
+def _index_version(alias: str, index: str) -> int:
+    suffix = index[len(alias):]
+    return int(suffix[2:]) if suffix.startswith("-v") and suffix[2:].isdigit() else 0
+
+
+def migrate_index(es: Elasticsearch, document: Any, alias: str = None, script: str = None,
+                  slices: Any = "auto", poll_interval: float = 5.,
+                  settings: Dict[str, Any] = None, delete_source: bool = False,
+                  source_excludes: List[str] = None, mappings: Dict[str, Any] = None,
+                  max_block_time: float = DEFAULT_MAX_BLOCK_TIME,
+                  block_attempts: int = 5) -> str:
+    """Reindexes the documents of `alias` into a new version of its index and swaps the alias.
+
+    After a first copy, catch-up passes only copy the documents written since the previous
+    pass, with their versions. The last one runs while the source is write-blocked, so that no
+    write is lost before the swap, and the store retries the blocked writes in the meantime.
+    When it takes longer than `max_block_time`, it is cancelled and the source unblocked, and
+    the migration tries again after another catch-up pass, up to `block_attempts` times.
+    An index created before the aliases is replaced by the alias named after it.
+    """
+    alias = alias or document._index._name
+    for index, mapping in es.indices.get_mapping(index=alias).items():
+        # Reindexing copies the _source, the fields it excludes would be lost
+        if mapping["mappings"].get("_source", {}).get("excludes"):
+            raise RuntimeError(f'{index} excludes fields from _source, it cannot be reindexed')
+    sources = list(es.indices.get_alias(name=alias)) if es.indices.exists_alias(name=alias) \
+        else []
+    dest = versioned_index_name(
+        alias, max([_index_version(alias, index) for index in sources], default=0) + 1)
+    document.create_index(dest, using=es, settings=settings, source_excludes=source_excludes,
+                          mappings=mappings)
+    actions: List[Dict[str, Any]] = [{"remove": {"index": index, "alias": alias}}
+                                     for index in sources] or [{"remove_index": {"index": alias}}]
+    actions.append({"add": {"index": dest, "alias": alias, "is_write_index": True}})
+    blocked = ",".join(sources) or alias
+    checkpoint = seq_no_checkpoint(es, alias)
+    _logger.info("Copying %s to %s", alias, dest)
+    reindex(es, alias, dest, script=script, slices=slices, poll_interval=poll_interval,
+            external_versions=True)
+    for _ in range(block_attempts):
+        pass_checkpoint = seq_no_checkpoint(es, alias)
+        _logger.info("Copying the documents of %s written since sequence number %s to %s",
+                     alias, checkpoint, dest)
+        reindex(es, alias, dest, script=script, slices=slices, poll_interval=poll_interval,
+                external_versions=True, query=_changed_since(checkpoint))
+        checkpoint = pass_checkpoint
+        es.indices.put_settings(index=blocked, body={"index.blocks.write": True})
+        start = time.monotonic()
+        try:
+            reindex(es, alias, dest, script=script, slices=slices,
+                    poll_interval=min(poll_interval, max_block_time / 10),
+                    external_versions=True, query=_changed_since(checkpoint),
+                    timeout=max_block_time)
+            es.indices.update_aliases(body={"actions": actions})
+        except TaskTimeoutError:
+            es.indices.put_settings(index=blocked, body={"index.blocks.write": None})
+            _logger.warning("The last copy of %s took longer than %s s, writes are unblocked "
+                            "until the next attempt", alias, max_block_time)
+            continue
+        except Exception:
+            es.indices.put_settings(index=blocked, body={"index.blocks.write": None})
+            raise
+        _logger.info("Alias %s swapped to %s, writes were blocked for %.1f s", alias, dest,
+                     time.monotonic() - start)
+        break
+    else:
+        raise RuntimeError(f'{alias} could not be swapped to {dest} within {max_block_time} s '
+                           f'of blocked writes, {dest} is left without alias')
+    if delete_source and sources:
+        es.indices.delete(index=blocked)
+    elif sources:
+        es.indices.put_settings(index=blocked, body={"index.blocks.write": None})
+    return dest
+
+
+def migrate_metric_routing(es: Elasticsearch, index: str = "mlflow-metrics",
+                           slices: Any = "auto", poll_interval: float = 5.,
+                           settings: Dict[str, Any] = None, delete_source: bool = False,
+                           source_excludes: List[str] = None,
+                           max_block_time: float = DEFAULT_MAX_BLOCK_TIME) -> str:
+    """Reindexes the metrics of `index` with their run_id as routing."""
+    return migrate_index(es, ElasticMetric, index, script="ctx._routing = ctx._source.run_id",
+                         slices=slices, poll_interval=poll_interval, settings=settings,
+                         delete_source=delete_source, source_excludes=source_excludes,
+                         max_block_time=max_block_time)
+
+
+def migrate_run_routing(es: Elasticsearch, index: str = "mlflow-runs", slices: Any = "auto",
+                        poll_interval: float = 5., settings: Dict[str, Any] = None,
+                        delete_source: bool = False, mappings: Dict[str, Any] = None,
+                        max_block_time: float = DEFAULT_MAX_BLOCK_TIME) -> str:
+    """Reindexes the runs of `index` with their experiment_id as routing."""
+    return migrate_index(es, ElasticRun, index, script="ctx._routing = ctx._source.experiment_id",
+                         slices=slices, poll_interval=poll_interval, settings=settings,
+                         delete_source=delete_source, mappings=mappings,
+                         max_block_time=max_block_time)
+
+
+def rebuild_column_catalogs(store: ElasticsearchStore) -> None:
+    ElasticColumnCatalog.init(index=store._index_name(ElasticColumnCatalog), using=store.using,
+                              settings=store.index_settings["columns"])
+    for experiment in store.list_experiments(ViewType.ALL):
+        _logger.info("Rebuilding the column catalog of experiment %s", experiment.experiment_id)
+        store.rebuild_column_catalog(experiment.experiment_id)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Migrations of the indices of mlflow-elasticsearchstore")
+    parser.add_argument("store_uri", help="backend store uri, elasticsearch://host:port")
+    parser.add_argument("--slices", default="auto", help="number of reindex slices")
+    parser.add_argument("--delete-source", action="store_true",
+                        help="delete the previous version of the index once migrated")
+    parser.add_argument("--max-block-time", type=float,
+                        help="longest time writes are blocked before swapping the alias, in "
+                             "seconds, by default the total backoff of the store uri")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    subparsers.add_parser("metric-routing",
+                          help="reindex mlflow-metrics with run_id routing")
+    subparsers.add_parser("run-routing",
+                          help="reindex mlflow-runs with experiment_id routing")
+    subparsers.add_parser("column-catalog",
+                          help="rebuild the column catalogs of every experiment")
+    reindex_parser = subparsers.add_parser(
+        "reindex", help="reindex into a new version of the index with the current mapping")
+    reindex_parser.add_argument("index", choices=list(INDEX_DOCUMENTS))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    parsed_uri = urllib.parse.urlparse(args.store_uri)
+    es = connections.create_connection(hosts=[parsed_uri.netloc])
+    slices = args.slices if args.slices == "auto" else int(args.slices)
+    store_options = dict(urllib.parse.parse_qsl(parsed_uri.query))
+    index_settings = load_index_settings(store_options)
+    prefix = store_options.get("index_prefix", DEFAULT_INDEX_PREFIX)
+    metric_source_excludes = METRIC_DOC_VALUE_FIELDS \
+        if _parse_bool(store_options.get("metric_source_excludes")) else None
+    run_mappings = like_subfields_mappings() \
+        if _parse_bool(store_options.get("like_subfields")) else None
+    max_block_time = args.max_block_time if args.max_block_time is not None else \
+        max_backoff_time(int(store_options.get("backoff_retries", DEFAULT_BACKOFF_RETRIES)),
+                         float(store_options.get("backoff_initial", DEFAULT_BACKOFF_INITIAL)),
+                         float(store_options.get("backoff_max", DEFAULT_BACKOFF_MAX)))
+    if args.command == "metric-routing":
+        migrate_metric_routing(es, index_name(ElasticMetric, prefix), slices=slices,
+                               settings=index_settings["metrics"],
+                               delete_source=args.delete_source,
+                               source_excludes=metric_source_excludes,
+                               max_block_time=max_block_time)
+    elif args.command == "run-routing":
+        migrate_run_routing(es, index_name(ElasticRun, prefix), slices=slices,
+                            settings=index_settings["runs"], delete_source=args.delete_source,
+                            mappings=run_mappings, max_block_time=max_block_time)
+    elif args.command == "reindex":
+        document = INDEX_DOCUMENTS[args.index]
+        migrate_index(es, document, index_name(document, prefix), slices=slices,
+                      settings=index_settings[args.index], delete_source=args.delete_source,
+                      source_excludes=metric_source_excludes if args.index == "metrics"
+                      else None,
+                      mappings=run_mappings if args.index == "runs" else None,
+                      max_block_time=max_block_time)
+    elif args.command == "column-catalog":
+        rebuild_column_catalogs(ElasticsearchStore(args.store_uri, None))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,84 @@
 import datetime
-from elasticsearch_dsl import (Document, InnerDoc, Nested, Text,
-                               Keyword, Double, Integer, Long, Boolean)
+from typing import Any, Dict, List
+from elasticsearch_dsl import (Document, InnerDoc, Nested, Object, Text, MetaField, Keyword,
+                               Double, Integer, Long, Boolean)
 
 from mlflow.entities import (Experiment, RunTag, Metric, Param,
                              RunData, RunInfo, Run, ExperimentTag)
 
+# Bump when a mapping changes, so that stores put the new mappings on existing indices
+MAPPING_VERSION = 1
+MAPPING_VERSION_KEY = "mapping_version"
+
+
+def mapping_meta() -> MetaField:
+    return MetaField({MAPPING_VERSION_KEY: MAPPING_VERSION})
+
+
+DEFAULT_INDEX_PREFIX = "mlflow"
+# Fields of the metric history, which can be read from doc values instead of _source
+METRIC_DOC_VALUE_FIELDS = ["key", "value", "timestamp", "step", "is_nan"]
+
+
+def index_name(document: Any, prefix: str = DEFAULT_INDEX_PREFIX) -> str:
+    return prefix + document._index._name[len(DEFAULT_INDEX_PREFIX):]
+
+
+def versioned_index_name(alias: str, version: int) -> str:
+    return f'{alias}-v{version}'
+
+
+class MlflowDocument(Document):
+    """Document stored in versioned indices, reached through the alias named after the index.
+
+    A migration reindexes the documents into a new version of the index and swaps the alias,
+    so that mappings change without downtime. Indices created before the aliases keep being
+    used under their name until they are migrated.
+    """
+
+    @classmethod
+    def create_index(cls, index: str, using: Any = None, settings: Dict[str, Any] = None,
+                     alias: str = None, source_excludes: List[str] = None,
+                     mappings: Dict[str, Any] = None) -> None:
+        i = cls._index.clone(name=index)
+        i.settings(**(settings or {}))
+        if source_excludes:
+            i.get_or_create_mapping().meta("_source", excludes=source_excludes)
+        if alias is not None:
+            i.aliases(**{alias: {"is_write_index": True}})
+        i.create(using=using)
+        if mappings:
+            i.put_mapping(using=using, body=mappings)
+
+    @classmethod
+    def init(cls, index: str = None, using: Any = None, settings: Dict[str, Any] = None,
+             source_excludes: List[str] = None, mappings: Dict[str, Any] = None) -> None:
+        # Static settings such as the number of shards and the fields excluded from _source
+        # cannot change once the index exists, they only apply to the creation of the index.
+        # `mappings` adds optional fields to the mapping of the document.
+        alias = index or cls._index._name
+        i = cls._index.clone(name=alias)
+        if i.exists(using=using):
+            i.put_mapping(using=using, body=i.to_dict()["mappings"])
+            if mappings:
+                i.put_mapping(using=using, body=mappings)
+        else:
+            cls.create_index(versioned_index_name(alias, 1), using, settings, alias,
+                             source_excludes, mappings)
+
+
+# The wildcard type requires Elasticsearch 7.9, the subfields are only mapped when enabled
+LIKE_SUBFIELDS_MAPPING_VERSION = f'{MAPPING_VERSION}+like_subfields'
+
+
+def like_subfields_mappings() -> Dict[str, Any]:
+    value = {"type": "keyword", "fields": {"wildcard": {"type": "wildcard"},
+                                           "lower": {"type": "keyword",
+                                                     "normalizer": "lowercase"}}}
+    return {"_meta": {MAPPING_VERSION_KEY: LIKE_SUBFIELDS_MAPPING_VERSION},
+            "properties": {field: {"type": "nested", "properties": {"value": value}}
+                           for field in ("params", "tags")}}
+
 
 class ElasticExperimentTag(InnerDoc):
     key = Keyword()
@@ -15,12 +89,15 @@ class ElasticExperimentTag(InnerDoc):
                              value=self.value)
 
 
-class ElasticExperiment(Document):
+class ElasticExperiment(MlflowDocument):
     name = Keyword()
     artifact_location = Text()
     lifecycle_stage = Keyword()
     tags = Nested(ElasticExperimentTag)
 
+    class Meta:
+        meta = mapping_meta()
+
     class Index:
         name = 'mlflow-experiments'
         settings = {
@@ -37,7 +114,7 @@ class ElasticExperiment(Document):
             tags=[t.to_mlflow_entity() for t in self.tags])
 
 
-class ElasticMetric(Document):
+class ElasticMetric(MlflowDocument):
     key = Keyword()
     value = Double()
     timestamp = Long()
@@ -45,6 +122,9 @@ class ElasticMetric(Document):
     is_nan = Boolean()
     run_id = Keyword()
 
+    class Meta:
+        meta = mapping_meta()
+
     class Index:
         name = 'mlflow-metrics'
         settings = {
@@ -95,7 +175,11 @@ class ElasticTag(InnerDoc):
             value=self.value)
 
 
-class ElasticRun(Document):
+def metric_sort_key(key: str) -> str:
+    return key.replace(".", "%2E")
+
+
+class ElasticRun(MlflowDocument):
     run_id = Keyword()
     name = Keyword()
     source_type = Keyword()
@@ -111,6 +195,12 @@ class ElasticRun(Document):
     latest_metrics = Nested(ElasticLatestMetric)
     params = Nested(ElasticParam)
     tags = Nested(ElasticTag)
+    metric_sort = Object()
+
+    class Meta:
+        meta = mapping_meta()
+        dynamic_templates = MetaField([{"metric_sort": {"path_match": "metric_sort.*",
+                                                        "mapping": {"type": "double"}}}])
 
     class Index:
         name = 'mlflow-runs'
@@ -136,3 +226,24 @@ class ElasticRun(Document):
             params=[p.to_mlflow_entity() for p in self.params],
             tags=[t.to_mlflow_entity() for t in self.tags])
         return Run(run_info=run_info, run_data=run_data)
+
+
+class ElasticColumnCatalog(MlflowDocument):
+    experiment_id = Keyword()
+    latest_metrics = Keyword(multi=True, index=False, doc_values=False)
+    params = Keyword(multi=True, index=False, doc_values=False)
+    tags = Keyword(multi=True, index=False, doc_values=False)
+
+    class Meta:
+        meta = mapping_meta()
+
+    class Index:
+        name = 'mlflow-columns'
+        settings = {
+            "number_of_shards": 1,
+            "number_of_replicas": 1
+        }
+
+
+INDEX_DOCUMENTS = {"experiments": ElasticExperiment, "runs": ElasticRun,
+                   "metrics": ElasticMetric, "columns": ElasticColumnCatalog}
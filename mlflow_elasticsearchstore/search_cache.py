@@ -0,0 +1,73 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class SearchCache:
+    """Interface of the cache used by ElasticsearchStore to serve repeated run searches.
+
+    Cached pages are keyed on the experiments generations, so an implementation sharing
+    its generations between processes gets cross-process invalidation; otherwise the ttl
+    bounds the staleness. Pages searched before the last writes to an experiment are visible
+    are not cached, which needs the time since its generation was bumped.
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    def get_generation(self, experiment_id: str) -> int:
+        raise NotImplementedError
+
+    def bump_generation(self, experiment_id: str) -> None:
+        raise NotImplementedError
+
+    def seconds_since_bump(self, experiment_id: str) -> Optional[float]:
+        raise NotImplementedError
+
+
+class InMemorySearchCache(SearchCache):
+
+    def __init__(self, ttl: float = 60., max_entries: int = 1000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._bumped_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, experiment_id: str) -> int:
+        return self._generations.get(experiment_id, 0)
+
+    def bump_generation(self, experiment_id: str) -> None:
+        with self._lock:
+            self._generations[experiment_id] = self._generations.get(experiment_id, 0) + 1
+            self._bumped_at[experiment_id] = time.monotonic()
+
+    def seconds_since_bump(self, experiment_id: str) -> Optional[float]:
+        bumped_at = self._bumped_at.get(experiment_id)
+        return None if bumped_at is None else time.monotonic() - bumped_at
@@ -0,0 +1,124 @@
+from typing import Any, List
+import sqlparse
+from sqlparse.sql import Comparison, Identifier, Parenthesis, Statement
+from sqlparse.tokens import Token as TokenType
+
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import INVALID_PARAMETER_VALUE
+from mlflow.utils.search_utils import SearchUtils
+
+
+class ElasticsearchSearchUtils(SearchUtils):
+    """SearchUtils accepting the run attributes that the store can filter on, and IN lists."""
+
+    NUMERIC_ATTRIBUTES = {"start_time", "end_time"}
+    STRING_ATTRIBUTES = {"status", "user_id", "run_id", "run_name"}
+    VALID_SEARCH_ATTRIBUTE_KEYS = SearchUtils.VALID_SEARCH_ATTRIBUTE_KEYS.union(
+        NUMERIC_ATTRIBUTES, STRING_ATTRIBUTES)
+    IN_OPERATOR = "IN"
+    REGEXP_RESERVED_CHARACTERS = set('.?+*|{}[]()"\\#@&<>~')
+
+    @classmethod
+    def like_to_wildcard(cls, pattern: str) -> str:
+        escaped = pattern.replace("\\", "\\\\").replace("*", "\\*").replace("?", "\\?")
+        return escaped.replace("%", "*").replace("_", "?")
+
+    @classmethod
+    def like_to_case_insensitive_regexp(cls, pattern: str) -> str:
+        # Character classes instead of the case_insensitive flag, which requires Elasticsearch 7.10
+        regexp = []
+        for char in pattern:
+            if char == "%":
+                regexp.append(".*")
+            elif char == "_":
+                regexp.append(".")
+            elif char.lower() != char.upper() and len(char.upper()) == 1:
+                regexp.append(f'[{char.lower()}{char.upper()}]')
+            elif char in cls.REGEXP_RESERVED_CHARACTERS:
+                regexp.append(f'\\{char}')
+            else:
+                regexp.append(char)
+        return "".join(regexp)
+
+    @classmethod
+    def _get_comparison(cls, comparison: Comparison) -> dict:
+        stripped_comparison = [token for token in comparison.tokens if not token.is_whitespace]
+        if len(stripped_comparison) == 3 and cls._is_in_operator(stripped_comparison[1]):
+            return cls._get_in_comparison(stripped_comparison[0], stripped_comparison[2])
+        cls._validate_comparison(stripped_comparison)
+        comp = cls._get_identifier(stripped_comparison[0].value, cls.VALID_SEARCH_ATTRIBUTE_KEYS)
+        comp["comparator"] = stripped_comparison[1].value
+        if comp["type"] == cls._ATTRIBUTE_IDENTIFIER and comp["key"] in cls.NUMERIC_ATTRIBUTES:
+            if stripped_comparison[2].ttype not in cls.NUMERIC_VALUE_TYPES:
+                raise MlflowException(
+                    "Expected numeric value type for attribute {}. Found {}"
+                    .format(comp["key"], stripped_comparison[2].value),
+                    error_code=INVALID_PARAMETER_VALUE)
+            comp["value"] = int(float(stripped_comparison[2].value))
+        else:
+            comp["value"] = cls._get_value(comp["type"], stripped_comparison[2])
+        return comp
+
+    @classmethod
+    def _is_in_operator(cls, token: Any) -> bool:
+        # Depending on the sqlparse version, `IN` is either a keyword or a comparison token
+        return token.match(ttype=TokenType.Keyword, values=[cls.IN_OPERATOR]) or \
+            token.match(ttype=TokenType.Operator.Comparison, values=[cls.IN_OPERATOR])
+
+    @classmethod
+    def _get_in_comparison(cls, identifier: Identifier, values: Parenthesis) -> dict:
+        comp = cls._get_identifier(identifier.value, cls.VALID_SEARCH_ATTRIBUTE_KEYS)
+        if comp["type"] == cls._METRIC_IDENTIFIER or comp["key"] in cls.NUMERIC_ATTRIBUTES:
+            raise MlflowException("IN is only supported on string values, not on '{}'"
+                                  .format(identifier.value), error_code=INVALID_PARAMETER_VALUE)
+        comp["comparator"] = cls.IN_OPERATOR
+        comp["value"] = [cls._strip_quotes(token.value, expect_quoted_value=True)
+                         for token in values.flatten()
+                         if token.ttype in cls.STRING_VALUE_TYPES]
+        return comp
+
+    @classmethod
+    def _process_statement(cls, statement: Statement) -> List[dict]:
+        tokens: List[Any] = [token for token in statement.tokens if not token.is_whitespace]
+        comparisons = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if isinstance(token, Comparison):
+                comparisons.append(cls._get_comparison(token))
+            elif isinstance(token, Identifier) and i + 2 < len(tokens) and \
+                    cls._is_in_operator(tokens[i + 1]) and \
+                    isinstance(tokens[i + 2], Parenthesis):
+                comparisons.append(cls._get_in_comparison(token, tokens[i + 2]))
+                i += 2
+            elif not token.match(ttype=TokenType.Keyword, values=["AND"]):
+                raise MlflowException(
+                    "Invalid clause(s) in filter string: '%s'" % token,
+                    error_code=INVALID_PARAMETER_VALUE,
+                )
+            i += 1
+        return comparisons
+
+    @classmethod
+    def parse_search_filter(cls, filter_string: str) -> List[dict]:
+        # SearchUtils.parse_search_filter does not dispatch _process_statement on cls
+        if not filter_string:
+            return []
+        try:
+            parsed = sqlparse.parse(filter_string)
+        except Exception:
+            raise MlflowException(
+                "Error on parsing filter '%s'" % filter_string, error_code=INVALID_PARAMETER_VALUE
+            )
+        if len(parsed) == 0 or not isinstance(parsed[0], Statement):
+            raise MlflowException(
+                "Invalid filter '%s'. Could not be parsed." % filter_string,
+                error_code=INVALID_PARAMETER_VALUE,
+            )
+        elif len(parsed) > 1:
+            raise MlflowException(
+                "Search filter contained multiple expression '%s'. "
+                "Provide AND-ed expression list." % filter_string,
+                error_code=INVALID_PARAMETER_VALUE,
+            )
+        return cls._process_statement(parsed[0])
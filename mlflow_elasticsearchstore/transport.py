@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from functools import wraps
+from typing import Any, Callable, Mapping, Optional, TypeVar, cast
+from elasticsearch import Transport
+from elasticsearch.exceptions import SerializationError, TransportError
+from elasticsearch.serializer import JSONSerializer
+try:
+    import orjson
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
+from mlflow_elasticsearchstore.backpressure import (RETRYABLE_STATUSES, CircuitBreaker,
+                                                    CircuitBreakerOpenError, backoff_delays,
+                                                    is_failure, is_retryable)
+
+OPAQUE_ID_PREFIX = "mlflow-elasticsearchstore/"
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_local = threading.local()
+
+
+def current_opaque_id() -> Optional[str]:
+    return getattr(_local, "opaque_id", None)
+
+
+def opaque_id(method_name: str) -> str:
+    return OPAQUE_ID_PREFIX + method_name
+
+
+def traced(method: F) -> F:
+    # Names the requests sent by a store method, nested store calls keep the outer name
+    @wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if current_opaque_id() is not None:
+            return method(*args, **kwargs)
+        _local.opaque_id = opaque_id(method.__name__)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _local.opaque_id = None
+    return cast(F, wrapper)
+
+
+class ForkSafeTransport(Transport):
+    """Transport opening new connections in a process forked after its creation.
+
+    The sockets of the connections inherited from the parent process are shared with it,
+    so the child process rebuilds the connections from the seed hosts on its first request.
+    """
+
+    def __init__(self, hosts: Any, *args: Any, **kwargs: Any) -> None:
+        self._pid = os.getpid()
+        self._fork_lock = threading.Lock()
+        self._seed_hosts = hosts
+        super(ForkSafeTransport, self).__init__(hosts, *args, **kwargs)
+
+    def _reset_after_fork(self) -> None:
+        with self._fork_lock:
+            if self._pid == os.getpid():
+                return
+            # Connections reused by set_connections would share the sockets of the parent
+            del self.connection_pool
+            if self._seed_hosts:
+                self.set_connections(self._seed_hosts)
+                self.seed_connections = list(self.connection_pool.connections[:])
+            if self.sniff_on_start:
+                self.sniff_hosts(True)
+            self._pid = os.getpid()
+
+    def perform_request(self, method: str, url: str, headers: Mapping[str, str] = None,
+                        params: Mapping[str, Any] = None, body: Any = None) -> Any:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        return super(ForkSafeTransport, self).perform_request(method, url, headers=headers,
+                                                              params=params, body=body)
+
+
+class BackpressureTransport(ForkSafeTransport):
+    """Transport retrying the requests rejected by the cluster with a jittered backoff.
+
+    Requests still failing after the retries, timed out requests and server errors count as
+    failures of the circuit breaker, if any, which rejects the requests while it is open.
+    """
+
+    def __init__(self, hosts: Any, *args: Any, backoff_retries: int = 0,
+                 backoff_initial: float = .1, backoff_max: float = 10.,
+                 circuit_breaker: CircuitBreaker = None, **kwargs: Any) -> None:
+        self.backoff_retries = backoff_retries
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker
+        # The statuses retried here with a backoff are not also retried right away by Transport
+        kwargs.setdefault("retry_on_status", tuple(status for status in (502, 503, 504)
+                                                   if status not in RETRYABLE_STATUSES))
+        super(BackpressureTransport, self).__init__(hosts, *args, **kwargs)
+
+    def perform_request(self, method: str, url: str, headers: Mapping[str, str] = None,
+                        params: Mapping[str, Any] = None, body: Any = None) -> Any:
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitBreakerOpenError("N/A", "The circuit breaker of the cluster is open")
+        delays = backoff_delays(self.backoff_retries, self.backoff_initial, self.backoff_max)
+        while True:
+            try:
+                response = super(BackpressureTransport, self).perform_request(
+                    method, url, headers=headers, params=params, body=body)
+            except TransportError as e:
+                if not is_retryable(e):
+                    if breaker is not None and is_failure(e):
+                        breaker.record_failure()
+                    elif breaker is not None:
+                        breaker.record_success()
+                    raise
+                if breaker is not None:
+                    breaker.record_rejection()
+                delay = next(delays, None)
+                if delay is None:
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise
+                time.sleep(delay)
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return response
+
+
+class OpaqueIdTransport(BackpressureTransport):
+
+    def perform_request(self, method: str, url: str, headers: Mapping[str, str] = None,
+                        params: Mapping[str, Any] = None, body: Any = None) -> Any:
+        current_id = current_opaque_id()
+        if current_id is not None:
+            headers = dict(headers or {})
+            headers.setdefault("x-opaque-id", current_id)
+        return super(OpaqueIdTransport, self).perform_request(method, url, headers=headers,
+                                                              params=params, body=body)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """JSONSerializer encoding and decoding bodies with orjson."""
+
+    def loads(self, s: Any) -> Any:
+        try:
+            return orjson.loads(s)
+        except ValueError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data: Any) -> Any:
+        if isinstance(data, str):
+            return data
+        try:
+            # Bulk bodies are joined as strings by the client
+            return orjson.dumps(data, default=self.default,
+                                option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+        except TypeError as e:
+            raise SerializationError(data, e)
@@ -42,6 +42,8 @@ setuptools.setup(
     version=versioneer.get_version(),
     cmdclass=versioneer.get_cmdclass(),
     install_requires=REQUIREMENTS,
+    extras_require={"async": ["elasticsearch[async]>=7.8.0,<8.0.0"],
+                    "orjson": ["orjson"]},
     tests_require=["pytest"],
     python_requires=">=3.6",
     maintainer="Criteo",
@@ -56,7 +58,13 @@ setuptools.setup(
     # the plugin and then immediately use it with MLflow
     entry_points={
         # Define a Tracking Store plugin for tracking URIs with scheme 'file-plugin'
-        "mlflow.tracking_store": "elasticsearch=mlflow_elasticsearchstore."
-        "elasticsearch_store:ElasticsearchStore",
+        "mlflow.tracking_store": [
+            "elasticsearch=mlflow_elasticsearchstore.elasticsearch_store:ElasticsearchStore",
+            "elasticsearch-async=mlflow_elasticsearchstore.async_store:"
+            "AsyncElasticsearchStoreFacade",
+        ],
+        "console_scripts": [
+            "mlflow-elasticsearchstore-migrate=mlflow_elasticsearchstore.migration:main",
+        ]
     }
 )
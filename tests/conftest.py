@@ -4,10 +4,19 @@ from elasticsearch_dsl import connections
 
 from mlflow.tracking import MlflowClient
 
+from mlflow_elasticsearchstore import elasticsearch_store
 from mlflow_elasticsearchstore.elasticsearch_store import ElasticsearchStore
 from mlflow_elasticsearchstore.models import ElasticExperiment, ElasticRun, ElasticMetric
 
 
+@pytest.fixture(autouse=True)
+def mapping_versions_mock():
+    elasticsearch_store._initialized_indices.clear()
+    with mock.patch('mlflow_elasticsearchstore.elasticsearch_store._get_mapping_versions',
+                    return_value={}) as mapping_versions_mock:
+        yield mapping_versions_mock
+
+
 @pytest.fixture
 def create_store():
     connections.create_connection = mock.MagicMock()
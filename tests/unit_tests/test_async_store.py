@@ -0,0 +1,215 @@
+import asyncio
+import pytest
+import mock
+from elasticsearch.exceptions import TransportError
+
+from mlflow.entities import Metric, RunStatus, RunTag, LifecycleStage, ViewType
+from mlflow.exceptions import MlflowException
+
+from mlflow_elasticsearchstore.backpressure import CircuitBreaker
+from mlflow_elasticsearchstore.async_store import (AsyncElasticsearchStore,
+                                                   AsyncElasticsearchStoreFacade)
+from mlflow_elasticsearchstore.elasticsearch_store import (ElasticsearchStore,
+                                                           PartialSearchResultsWarning)
+
+run_hit = {"_index": "mlflow-runs", "_id": "1",
+           "_source": {"run_id": "1", "experiment_id": "experiment_id", "user_id": "user_id",
+                       "status": RunStatus.to_string(RunStatus.RUNNING), "start_time": 1,
+                       "lifecycle_stage": LifecycleStage.ACTIVE,
+                       "artifact_uri": "artifact_location",
+                       "latest_metrics": [{"key": "metric1", "value": 1, "timestamp": 1,
+                                           "step": 1, "is_nan": False}],
+                       "params": [{"key": "param1", "value": "val1"}],
+                       "tags": [{"key": "tag1", "value": "val1"}]}}
+
+
+@pytest.fixture
+def create_async_store(create_store):
+    with mock.patch('mlflow_elasticsearchstore.async_store.AsyncElasticsearch'):
+        async_store = AsyncElasticsearchStore("elasticsearch://store_uri", "artifact_uri",
+                                              store=create_store)
+    async_store.client = mock.AsyncMock()
+    return async_store
+
+
+def test_get_run(create_async_store):
+    create_async_store.client.get.return_value = run_hit
+    real_run = asyncio.run(create_async_store.get_run("1"))
+    create_async_store.client.get.assert_awaited_once_with(
+        index="mlflow-runs", id="1", routing=None,
+        opaque_id="mlflow-elasticsearchstore/get_run")
+    assert real_run.info.run_id == "1"
+    assert real_run.data.metrics == {"metric1": 1}
+    assert real_run.data.params == {"param1": "val1"}
+
+
+def test_log_metric(create_async_store):
+    create_async_store.client.get.return_value = run_hit
+    asyncio.run(create_async_store.log_metric("1", Metric(key="metric1", value=2,
+                                                          timestamp=2, step=2)))
+    create_async_store.client.index.assert_awaited_once_with(
+        index="mlflow-metrics",
+        body={"key": "metric1", "value": 2, "timestamp": 2, "step": 2,
+              "is_nan": False, "run_id": "1"},
+        opaque_id="mlflow-elasticsearchstore/log_metric")
+    create_async_store.client.update.assert_awaited_once_with(
+        index="mlflow-runs", id="1",
+        body={"doc": {"latest_metrics": [{"key": "metric1", "value": 2, "timestamp": 2,
+                                          "step": 2, "is_nan": False}]}},
+        opaque_id="mlflow-elasticsearchstore/log_metric")
+
+
+@mock.patch('asyncio.sleep')
+def test_log_batch(sleep_mock, create_async_store):
+    create_async_store.client.get.return_value = run_hit
+    create_async_store.client.bulk.side_effect = [
+        {"errors": True, "items": [{"index": {"status": 201}}, {"index": {"status": 429}}]},
+        {"errors": False, "items": [{"index": {"status": 201}}]}]
+    asyncio.run(create_async_store.log_batch(
+        "1", [Metric(key="metric1", value=2, timestamp=2, step=2),
+              Metric(key="metric2", value=3, timestamp=2, step=2)], [], []))
+    bulk_calls = create_async_store.client.bulk.await_args_list
+    assert bulk_calls[0] == mock.call(
+        body=[{"index": {"_index": "mlflow-metrics"}},
+              {"key": "metric1", "value": 2, "timestamp": 2, "step": 2, "is_nan": False,
+               "run_id": "1"},
+              {"index": {"_index": "mlflow-metrics"}},
+              {"key": "metric2", "value": 3, "timestamp": 2, "step": 2, "is_nan": False,
+               "run_id": "1"}],
+        opaque_id="mlflow-elasticsearchstore/log_batch")
+    assert bulk_calls[1][1]["body"][1]["key"] == "metric2"
+    sleep_mock.assert_awaited_once()
+    create_async_store.client.index.assert_awaited_once()
+
+
+@mock.patch('asyncio.sleep')
+def test_log_metric_retries_blocked_writes(sleep_mock, create_async_store):
+    create_async_store.client.get.return_value = run_hit
+    create_async_store.client.index.side_effect = [
+        TransportError(403, "cluster_block_exception"), {"result": "created"}]
+    metric = Metric(key="metric1", value=2, timestamp=2, step=2)
+    asyncio.run(create_async_store.log_metric("1", metric))
+    assert create_async_store.client.index.await_count == 2
+    sleep_mock.assert_awaited_once()
+    create_async_store.client.index.side_effect = None
+    create_async_store.client.update.side_effect = TransportError(400, "illegal_argument")
+    with pytest.raises(TransportError):
+        asyncio.run(create_async_store.log_metric("1", metric))
+    assert create_async_store.client.update.await_count == 2
+
+
+@mock.patch('asyncio.sleep')
+def test_log_batch_maps_transport_errors(sleep_mock, create_async_store):
+    create_async_store.client.get.return_value = run_hit
+    create_async_store.client.bulk.side_effect = TransportError(429, "es_rejected_execution")
+    metric = Metric(key="metric1", value=2, timestamp=2, step=2)
+    with pytest.raises(MlflowException) as excinfo:
+        asyncio.run(create_async_store.log_batch("1", [metric], [], []))
+    assert excinfo.value.error_code == "REQUEST_LIMIT_EXCEEDED"
+    assert create_async_store.client.bulk.await_count == 4
+    create_async_store.store.circuit_breaker = mock.Mock(spec=CircuitBreaker)
+    create_async_store.store.circuit_breaker.allow_request.side_effect = [True, False]
+    with pytest.raises(MlflowException) as excinfo:
+        asyncio.run(create_async_store.log_batch("1", [metric], [], []))
+    assert excinfo.value.error_code == "TEMPORARILY_UNAVAILABLE"
+    assert create_async_store.client.bulk.await_count == 4
+
+
+def test_set_tag_sheds_column_catalog_update(create_async_store):
+    with mock.patch('mlflow_elasticsearchstore.models.ElasticColumnCatalog.init'):
+        create_async_store.store = ElasticsearchStore(
+            "elasticsearch://store_uri?column_catalog=true", "artifact_uri")
+    create_async_store.store.circuit_breaker = CircuitBreaker(threshold=5)
+    create_async_store.store.circuit_breaker.record_rejection()
+    create_async_store.client.get.return_value = run_hit
+    asyncio.run(create_async_store.set_tag("1", RunTag("tag2", "val2")))
+    assert create_async_store.client.update.await_count == 1
+    assert create_async_store.client.update.await_args[1]["index"] == "mlflow-runs"
+    create_async_store.store.circuit_breaker = CircuitBreaker(threshold=5)
+    asyncio.run(create_async_store.set_tag("1", RunTag("tag3", "val3")))
+    assert create_async_store.client.update.await_args[1]["index"] == "mlflow-columns"
+
+
+def test_get_metric_history_with_doc_values(create_async_store):
+    create_async_store.store.metric_doc_values = True
+
+    async def scan_hits(*args, **kwargs):
+        yield {"_id": "1", "fields": {"key": ["metric1"], "value": [1.5], "timestamp": [1],
+                                      "step": [0], "is_nan": [False]}}
+
+    with mock.patch('mlflow_elasticsearchstore.async_store.async_scan',
+                    side_effect=scan_hits) as async_scan_mock:
+        metrics = asyncio.run(create_async_store.get_metric_history("1", "metric1"))
+    assert async_scan_mock.call_args[1]["query"]["docvalue_fields"] == [
+        "key", "value", "timestamp", "step", "is_nan"]
+    assert [(m.key, m.value, m.timestamp, m.step) for m in metrics] == [("metric1", 1.5, 1, 0)]
+
+
+def test__search_runs(create_async_store):
+    create_async_store.client.search.return_value = {
+        "took": 1, "hits": {"total": {"value": 1}, "hits": [dict(run_hit, sort=[1, "1"])]}}
+    runs, next_page_token = asyncio.run(create_async_store._search_runs(
+        ["experiment_id"], "params.param1 = 'val1'", ViewType.ACTIVE_ONLY, max_results=1))
+    search_kwargs = create_async_store.client.search.call_args[1]
+    assert search_kwargs["index"] == ["mlflow-runs"]
+    assert search_kwargs["body"]["size"] == 1
+    assert runs[0].info.run_id == "1"
+    assert next_page_token == "[1, '1']"
+
+
+def test__search_runs_with_search_limits(create_store):
+    with mock.patch('mlflow_elasticsearchstore.async_store.AsyncElasticsearch'):
+        async_store = AsyncElasticsearchStore(
+            "elasticsearch://store_uri", "artifact_uri", store=ElasticsearchStore(
+                "elasticsearch://store_uri?search_timeout=5s&search_runs_terminate_after=100"
+                "&search_request_timeout=10", "artifact_uri"))
+    async_store.client = mock.AsyncMock()
+    async_store.client.search.return_value = {"timed_out": True,
+                                              "_shards": {"total": 2, "failed": 0},
+                                              "hits": {"hits": []}}
+    with pytest.warns(PartialSearchResultsWarning, match="the search timed out"):
+        asyncio.run(async_store._search_runs(["experiment_id"], "", ViewType.ACTIVE_ONLY))
+    search_kwargs = async_store.client.search.call_args[1]
+    assert search_kwargs["body"]["timeout"] == "5s"
+    assert search_kwargs["body"]["terminate_after"] == 100
+    assert search_kwargs["request_timeout"] == 10.
+
+
+def test__search_runs_with_read_hosts(create_store):
+    with mock.patch('mlflow_elasticsearchstore.async_store.AsyncElasticsearch',
+                    side_effect=[mock.AsyncMock(), mock.AsyncMock()]) as client_mock:
+        async_store = AsyncElasticsearchStore(
+            "elasticsearch://store_uri", "artifact_uri", store=ElasticsearchStore(
+                "elasticsearch://store_uri?read_hosts=replica:9200", "artifact_uri"))
+    client_mock.assert_called_with(hosts=["replica:9200"])
+    async_store.read_client.search.return_value = {"hits": {"hits": []}}
+    asyncio.run(async_store._search_runs(["experiment_id"], "", ViewType.ACTIVE_ONLY))
+    async_store.read_client.search.assert_awaited_once()
+    async_store.client.search.assert_not_awaited()
+
+
+def test_facade_get_run(create_store):
+    with mock.patch('mlflow_elasticsearchstore.async_store.AsyncElasticsearch'):
+        facade = AsyncElasticsearchStoreFacade("elasticsearch://store_uri", "artifact_uri")
+    facade.async_store.client = mock.AsyncMock()
+    facade.async_store.client.get.return_value = run_hit
+    assert facade.get_run("1").info.run_id == "1"
+    facade.async_store.client.get.assert_awaited_once_with(
+        index="mlflow-runs", id="1", routing=None,
+        opaque_id="mlflow-elasticsearchstore/get_run")
+
+
+def test_facade_restarts_after_fork(create_store):
+    with mock.patch('mlflow_elasticsearchstore.async_store.AsyncElasticsearch'):
+        facade = AsyncElasticsearchStoreFacade("elasticsearch://store_uri", "artifact_uri")
+        async_store, loop = facade.async_store, facade._loop
+        assert facade.async_store is async_store
+        with mock.patch('mlflow_elasticsearchstore.async_store.os.getpid',
+                        return_value=facade._pid + 1):
+            assert facade.async_store is not async_store
+            assert facade._loop is not loop
+            assert facade._loop_thread.is_alive()
+            assert facade.async_store.store is facade
+            facade.async_store.client = mock.AsyncMock()
+            facade.async_store.client.get.return_value = run_hit
+            assert facade.get_run("1").info.run_id == "1"
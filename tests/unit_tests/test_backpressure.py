@@ -0,0 +1,57 @@
+import mock
+from elasticsearch.exceptions import ConnectionError, ConnectionTimeout, TransportError
+
+from mlflow_elasticsearchstore.backpressure import (CircuitBreaker, backoff_delays, is_failure,
+                                                    is_retryable)
+
+
+@mock.patch('random.uniform', side_effect=lambda low, high: high)
+def test_backoff_delays(uniform_mock):
+    assert list(backoff_delays(5, .1, 1.)) == [.1, .2, .4, .8, 1.]
+    uniform_mock.assert_called_with(0, 1.)
+
+
+def test_is_retryable():
+    assert is_retryable(TransportError(429, "es_rejected_execution_exception"))
+    assert is_retryable(ConnectionError("N/A", "connection refused"))
+    assert not is_retryable(ConnectionTimeout("TIMEOUT", "read timed out"))
+    assert not is_retryable(TransportError(400, "mapper_parsing_exception"))
+    assert is_retryable(TransportError(403, "cluster_block_exception"))
+    assert not is_retryable(TransportError(403, "security_exception"))
+
+
+def test_is_failure():
+    assert is_failure(ConnectionTimeout("TIMEOUT", "read timed out"))
+    assert is_failure(TransportError(500, "internal_server_error"))
+    assert is_failure(TransportError(504, "gateway_timeout"))
+    assert not is_failure(TransportError(400, "mapper_parsing_exception"))
+    assert not is_failure(TransportError(404, "index_not_found_exception"))
+    assert not is_failure(TransportError("N/A", "unknown"))
+
+
+@mock.patch('time.monotonic')
+def test_circuit_breaker(monotonic_mock):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    monotonic_mock.return_value = 0
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow_request()
+    monotonic_mock.return_value = 30
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow_request()
+
+
+@mock.patch('time.monotonic')
+def test_circuit_breaker_is_healthy(monotonic_mock):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    assert breaker.is_healthy
+    monotonic_mock.return_value = 0
+    breaker.record_rejection()
+    assert not breaker.is_healthy
+    monotonic_mock.return_value = 30
+    assert breaker.is_healthy
@@ -0,0 +1,73 @@
+import pickle
+
+import mock
+
+from mlflow.entities import Metric, Param, Run, RunData, RunInfo, RunStatus, RunTag
+
+from mlflow_elasticsearchstore import entities
+from mlflow_elasticsearchstore.entities import LazyRun
+
+run_info = RunInfo(run_uuid="1", run_id="1", experiment_id="experiment_id", user_id="user_id",
+                   status=RunStatus.to_string(RunStatus.RUNNING), start_time=1, end_time=None,
+                   lifecycle_stage="active", artifact_uri="artifact_location")
+run_data = RunData(metrics=[Metric(key="metric1", value=1, timestamp=1, step=1)],
+                   params=[Param(key="param1", value="val1")],
+                   tags=[RunTag(key="tag1", value="val1")])
+source = {"latest_metrics": [{"key": "metric1", "value": 1, "timestamp": 1, "step": 1}],
+          "params": [{"key": "param1", "value": "val1"}],
+          "tags": [{"key": "tag1", "value": "val1"}]}
+
+
+def test_lazy_run():
+    with mock.patch.object(entities, "source_to_run_data",
+                           return_value=run_data) as source_to_run_data:
+        lazy_run = LazyRun(run_info, source)
+        assert lazy_run.info == run_info
+        source_to_run_data.assert_not_called()
+        assert lazy_run.data.params == {"param1": "val1"}
+        assert lazy_run._data is lazy_run.data
+        source_to_run_data.assert_called_once_with(source, None)
+
+
+def test_lazy_run_is_compatible_with_run():
+    lazy_run = LazyRun(run_info, source)
+    run = Run(run_info, run_data)
+    assert isinstance(lazy_run, Run)
+    assert lazy_run.to_proto() == run.to_proto()
+    assert lazy_run.to_dictionary() == run.to_dictionary()
+    assert dict(lazy_run).keys() == dict(run).keys()
+
+
+def test_lazy_run_whitelist():
+    lazy_run = LazyRun(run_info, source, {"metrics": [], "params": ["param1"], "tags": []})
+    assert lazy_run.data.metrics == {}
+    assert lazy_run.data.params == {"param1": "val1"}
+    assert lazy_run.data.tags == {}
+
+
+def test_lazy_run_is_picklable():
+    lazy_run = LazyRun(run_info, source)
+    unpickled_run = pickle.loads(pickle.dumps(lazy_run))
+    assert unpickled_run.to_proto() == Run(run_info, run_data).to_proto()
+    lazy_run.data
+    unpickled_run = pickle.loads(pickle.dumps(lazy_run))
+    assert unpickled_run.to_proto() == Run(run_info, run_data).to_proto()
+
+
+class InterleavedLazyRun(LazyRun):
+    """LazyRun whose first read of its source lets another reader build the RunData."""
+
+    interleaved = False
+
+    def __getattribute__(self, name):
+        value = super(InterleavedLazyRun, self).__getattribute__(name)
+        if name == "_source" and not type(self).interleaved:
+            type(self).interleaved = True
+            assert self.data.params == {"param1": "val1"}
+        return value
+
+
+def test_lazy_run_concurrent_access():
+    lazy_run = InterleavedLazyRun(run_info, source)
+    assert lazy_run.data.params == {"param1": "val1"}
+    assert InterleavedLazyRun.interleaved
@@ -0,0 +1,79 @@
+import json
+import mock
+import pytest
+
+from mlflow.exceptions import MlflowException
+
+from mlflow_elasticsearchstore.index_settings import load_index_settings
+from mlflow_elasticsearchstore.models import ElasticColumnCatalog, ElasticMetric
+
+
+def test_load_index_settings(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps({
+        "metrics": {"number_of_shards": 12, "number_of_replicas": 1, "refresh_interval": "30s"},
+        "runs": {"translog_durability": "async"}}))
+    index_settings = load_index_settings(
+        {"index_settings_file": str(settings_file), "metrics_number_of_shards": "24"},
+        environ={"MLFLOW_ELASTICSEARCHSTORE_METRICS_NUMBER_OF_SHARDS": "6",
+                 "MLFLOW_ELASTICSEARCHSTORE_METRICS_NUMBER_OF_REPLICAS": "0"})
+    assert index_settings == {
+        "experiments": {}, "columns": {}, "runs": {"translog.durability": "async"},
+        "metrics": {"number_of_shards": "24", "number_of_replicas": "0",
+                    "refresh_interval": "30s"}}
+
+
+def test_load_index_settings_from_environment_file(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps({"runs": {"number_of_shards": 4}}))
+    index_settings = load_index_settings(
+        {}, environ={"MLFLOW_ELASTICSEARCHSTORE_INDEX_SETTINGS_FILE": str(settings_file)})
+    assert index_settings["runs"] == {"number_of_shards": 4}
+
+
+def test_load_index_settings_with_unknown_settings(tmp_path):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps({"runs": {"number_of_shard": 4}}))
+    with pytest.raises(MlflowException, match="number_of_shard"):
+        load_index_settings({"index_settings_file": str(settings_file)}, environ={})
+
+
+@mock.patch('elasticsearch_dsl.Index.create', autospec=True)
+@mock.patch('elasticsearch_dsl.Index.put_mapping')
+@mock.patch('elasticsearch_dsl.Index.exists')
+def test_init_with_settings(exists_mock, put_mapping_mock, create_mock):
+    exists_mock.return_value = False
+    ElasticColumnCatalog.init(using="default", settings={"number_of_shards": "6"})
+    created_index = create_mock.call_args[0][0]
+    assert created_index._name == "mlflow-columns-v1"
+    assert created_index.to_dict()["settings"] == {"number_of_shards": "6",
+                                                   "number_of_replicas": 1}
+    assert created_index.to_dict()["aliases"] == {"mlflow-columns": {"is_write_index": True}}
+    create_mock.assert_called_once_with(created_index, using="default")
+    exists_mock.return_value = True
+    ElasticColumnCatalog.init(using="default", settings={"number_of_shards": "6"})
+    put_mapping_mock.assert_called_once_with(
+        using="default", body=ElasticColumnCatalog._index.to_dict()["mappings"])
+    assert create_mock.call_count == 1
+
+
+@mock.patch('elasticsearch_dsl.Index.create', autospec=True)
+@mock.patch('elasticsearch_dsl.Index.exists')
+def test_init_with_source_excludes(exists_mock, create_mock):
+    exists_mock.return_value = False
+    ElasticMetric.create_index("mlflow-metrics-v1", using="default",
+                               source_excludes=["value", "step"])
+    mappings = create_mock.call_args[0][0].to_dict()["mappings"]
+    assert mappings["_source"] == {"excludes": ["value", "step"]}
+    assert "_source" not in ElasticMetric._index.to_dict()["mappings"]
+
+
+@mock.patch('elasticsearch_dsl.Index.put_mapping')
+@mock.patch('elasticsearch_dsl.Index.exists')
+def test_init_with_mappings(exists_mock, put_mapping_mock):
+    exists_mock.return_value = True
+    mappings = {"properties": {"experiment_id": {"type": "keyword"}}}
+    ElasticColumnCatalog.init(using="default", mappings=mappings)
+    assert put_mapping_mock.call_args_list == [
+        mock.call(using="default", body=ElasticColumnCatalog._index.to_dict()["mappings"]),
+        mock.call(using="default", body=mappings)]
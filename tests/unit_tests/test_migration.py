@@ -0,0 +1,244 @@
+import mock
+import pytest
+from types import SimpleNamespace
+
+from mlflow.entities import ViewType
+
+from mlflow_elasticsearchstore.migration import (DEFAULT_MAX_BLOCK_TIME, main, migrate_index,
+                                                 migrate_metric_routing, migrate_run_routing,
+                                                 rebuild_column_catalogs, seq_no_checkpoint,
+                                                 TaskTimeoutError, wait_for_task)
+from mlflow_elasticsearchstore.models import (ElasticMetric, ElasticRun, METRIC_DOC_VALUE_FIELDS,
+                                              like_subfields_mappings)
+
+
+@mock.patch('time.sleep')
+def test_wait_for_task(sleep_mock):
+    es = mock.MagicMock()
+    es.tasks.get.side_effect = [
+        {"completed": False, "task": {"status": {"created": 1, "total": 2}}},
+        {"completed": True, "response": {"created": 2, "failures": []}}]
+    assert wait_for_task(es, "task_id") == {"created": 2, "failures": []}
+    sleep_mock.assert_called_once_with(5.)
+
+
+def test_wait_for_task_with_failures():
+    es = mock.MagicMock()
+    es.tasks.get.return_value = {"completed": True,
+                                 "response": {"failures": [{"cause": "cause"}]}}
+    with pytest.raises(RuntimeError, match="Task task_id failed"):
+        wait_for_task(es, "task_id")
+
+
+def shard_stats(*max_seq_nos):
+    return {"indices": {"mlflow-metrics-v1": {"shards": {
+        str(shard): [{"routing": {"primary": True}, "seq_no": {"max_seq_no": max_seq_no}},
+                     {"routing": {"primary": False}, "seq_no": {"max_seq_no": -1}}]
+        for shard, max_seq_no in enumerate(max_seq_nos)}}}}
+
+
+def test_wait_for_task_with_timeout():
+    es = mock.MagicMock()
+    es.tasks.get.return_value = {"completed": False, "task": {"status": {}}}
+    with pytest.raises(TaskTimeoutError):
+        wait_for_task(es, "task_id", timeout=0)
+    es.tasks.cancel.assert_called_once_with(task_id="task_id")
+
+
+def test_seq_no_checkpoint():
+    es = mock.MagicMock()
+    es.indices.stats.return_value = shard_stats(12, 10, 15)
+    assert seq_no_checkpoint(es, "mlflow-metrics") == 10
+    es.indices.stats.return_value = {}
+    assert seq_no_checkpoint(es, "mlflow-metrics") == -1
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticMetric.create_index')
+def test_migrate_index(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = True
+    es.indices.get_alias.return_value = {"mlflow-metrics-v1": {}, "mlflow-metrics-v2": {}}
+    es.indices.stats.side_effect = [shard_stats(10), shard_stats(15)]
+    es.reindex.return_value = {"task": "task_id"}
+    es.tasks.get.return_value = {"completed": True, "response": {"failures": []}}
+    assert migrate_index(es, ElasticMetric, delete_source=True) == "mlflow-metrics-v3"
+    create_index_mock.assert_called_once_with("mlflow-metrics-v3", using=es, settings=None,
+                                              source_excludes=None, mappings=None)
+    body = {"source": {"index": "mlflow-metrics"},
+            "dest": {"index": "mlflow-metrics-v3", "version_type": "external"},
+            "conflicts": "proceed"}
+    assert es.reindex.call_args_list == [
+        mock.call(body=dict(body, source=dict(body["source"], **query)), slices="auto",
+                  refresh=True, wait_for_completion=False)
+        for query in ({}, {"query": {"range": {"_seq_no": {"gt": 10}}}},
+                      {"query": {"range": {"_seq_no": {"gt": 15}}}})]
+    es.indices.put_settings.assert_called_once_with(index="mlflow-metrics-v1,mlflow-metrics-v2",
+                                                    body={"index.blocks.write": True})
+    es.indices.update_aliases.assert_called_once_with(body={"actions": [
+        {"remove": {"index": "mlflow-metrics-v1", "alias": "mlflow-metrics"}},
+        {"remove": {"index": "mlflow-metrics-v2", "alias": "mlflow-metrics"}},
+        {"add": {"index": "mlflow-metrics-v3", "alias": "mlflow-metrics",
+                 "is_write_index": True}}]})
+    es.indices.delete.assert_called_once_with(index="mlflow-metrics-v1,mlflow-metrics-v2")
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticRun.create_index')
+def test_migrate_index_blocks_writes(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = True
+    es.indices.get_alias.return_value = {"mlflow-runs-v1": {}}
+    es.indices.stats.return_value = shard_stats(10)
+    es.reindex.return_value = {"task": "task_id"}
+    es.tasks.get.return_value = {"completed": True, "response": {"failures": []}}
+    migrate_index(es, ElasticRun)
+    calls = [call[0] for call in es.mock_calls
+             if call[0] in ("reindex", "indices.put_settings", "indices.update_aliases")]
+    assert calls == ["reindex", "reindex", "indices.put_settings", "reindex",
+                     "indices.update_aliases", "indices.put_settings"]
+    assert es.indices.put_settings.call_args_list == [
+        mock.call(index="mlflow-runs-v1", body={"index.blocks.write": True}),
+        mock.call(index="mlflow-runs-v1", body={"index.blocks.write": None})]
+    es.indices.delete.assert_not_called()
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticRun.create_index')
+def test_migrate_index_unblocks_writes_on_failure(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = False
+    es.indices.stats.return_value = shard_stats(10)
+    es.reindex.return_value = {"task": "task_id"}
+    es.tasks.get.side_effect = [{"completed": True, "response": {"failures": []}}] * 2 + [
+        {"completed": True, "error": "reason"}]
+    with pytest.raises(RuntimeError):
+        migrate_index(es, ElasticRun)
+    assert es.indices.put_settings.call_args_list == [
+        mock.call(index="mlflow-runs", body={"index.blocks.write": True}),
+        mock.call(index="mlflow-runs", body={"index.blocks.write": None})]
+    es.indices.update_aliases.assert_not_called()
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticRun.create_index')
+def test_migrate_index_with_blocked_copy_timeout(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = True
+    es.indices.get_alias.return_value = {"mlflow-runs-v1": {}}
+    es.indices.stats.return_value = shard_stats(10)
+    es.reindex.return_value = {"task": "task_id"}
+    completed = {"completed": True, "response": {"failures": []}}
+    running = {"completed": False, "task": {"status": {}}}
+    es.tasks.get.side_effect = [completed, completed, running, completed, completed]
+    assert migrate_index(es, ElasticRun, max_block_time=0) == "mlflow-runs-v2"
+    es.tasks.cancel.assert_called_once_with(task_id="task_id")
+    assert es.reindex.call_count == 5
+    assert [c[1]["body"] for c in es.indices.put_settings.call_args_list] == [
+        {"index.blocks.write": True}, {"index.blocks.write": None},
+        {"index.blocks.write": True}, {"index.blocks.write": None}]
+    es.indices.update_aliases.assert_called_once()
+    es.tasks.get.side_effect = [completed, completed, running]
+    with pytest.raises(RuntimeError, match="mlflow-runs-v2 is left without alias"):
+        migrate_index(es, ElasticRun, max_block_time=0, block_attempts=1)
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticMetric.create_index')
+def test_migrate_metric_routing(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = False
+    es.indices.stats.return_value = shard_stats(10)
+    es.reindex.return_value = {"task": "task_id"}
+    es.tasks.get.return_value = {"completed": True, "response": {"failures": []}}
+    migrate_metric_routing(es, settings={"number_of_shards": "6"})
+    create_index_mock.assert_called_once_with("mlflow-metrics-v1", using=es,
+                                              settings={"number_of_shards": "6"},
+                                              source_excludes=None, mappings=None)
+    assert es.reindex.call_args_list[0] == mock.call(
+        body={"source": {"index": "mlflow-metrics"},
+              "dest": {"index": "mlflow-metrics-v1", "version_type": "external"},
+              "script": {"source": "ctx._routing = ctx._source.run_id", "lang": "painless"},
+              "conflicts": "proceed"},
+        slices="auto", refresh=True, wait_for_completion=False)
+    assert es.reindex.call_count == 3
+    es.indices.update_aliases.assert_called_once_with(body={"actions": [
+        {"remove_index": {"index": "mlflow-metrics"}},
+        {"add": {"index": "mlflow-metrics-v1", "alias": "mlflow-metrics",
+                 "is_write_index": True}}]})
+    es.indices.delete.assert_not_called()
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticRun.create_index')
+def test_migrate_run_routing(create_index_mock):
+    es = mock.MagicMock()
+    es.indices.exists_alias.return_value = True
+    es.indices.get_alias.return_value = {"mlflow-runs-v1": {}}
+    es.reindex.return_value = {"task": "task_id"}
+    es.tasks.get.return_value = {"completed": True, "response": {"failures": []}}
+    assert migrate_run_routing(es) == "mlflow-runs-v2"
+    assert es.reindex.call_args_list[0][1]["body"]["script"] == {
+        "source": "ctx._routing = ctx._source.experiment_id", "lang": "painless"}
+
+
+@mock.patch('mlflow_elasticsearchstore.migration.migrate_run_routing')
+@mock.patch('elasticsearch_dsl.connections.create_connection')
+def test_main_run_routing(create_connection_mock, migrate_run_routing_mock):
+    main(["elasticsearch://host:9200?index_prefix=team-a", "run-routing"])
+    migrate_run_routing_mock.assert_called_once_with(create_connection_mock.return_value,
+                                                     "team-a-runs", slices="auto", settings={},
+                                                     delete_source=False, mappings=None,
+                                                     max_block_time=DEFAULT_MAX_BLOCK_TIME)
+
+
+@mock.patch('mlflow_elasticsearchstore.migration.migrate_metric_routing')
+@mock.patch('elasticsearch_dsl.connections.create_connection')
+def test_main(create_connection_mock, migrate_metric_routing_mock):
+    main(["elasticsearch://host:9200?metrics_number_of_shards=6", "--slices", "4",
+          "metric-routing"])
+    create_connection_mock.assert_called_once_with(hosts=["host:9200"])
+    migrate_metric_routing_mock.assert_called_once_with(create_connection_mock.return_value,
+                                                        "mlflow-metrics", slices=4,
+                                                        settings={"number_of_shards": "6"},
+                                                        delete_source=False,
+                                                        source_excludes=None,
+                                                        max_block_time=DEFAULT_MAX_BLOCK_TIME)
+
+
+@mock.patch('mlflow_elasticsearchstore.migration.migrate_index')
+@mock.patch('elasticsearch_dsl.connections.create_connection')
+def test_main_reindex(create_connection_mock, migrate_index_mock):
+    main(["elasticsearch://host:9200?runs_number_of_replicas=2&index_prefix=team-a"
+          "&metric_source_excludes=true&like_subfields=true&backoff_retries=5&backoff_max=2",
+          "--delete-source", "reindex", "runs"])
+    migrate_index_mock.assert_called_once_with(create_connection_mock.return_value, ElasticRun,
+                                               "team-a-runs", slices="auto",
+                                               settings={"number_of_replicas": "2"},
+                                               delete_source=True, source_excludes=None,
+                                               mappings=like_subfields_mappings(),
+                                               max_block_time=.1 + .2 + .4 + .8 + 1.6)
+    main(["elasticsearch://host:9200?metric_source_excludes=true", "--max-block-time", "30",
+          "reindex", "metrics"])
+    migrate_index_mock.assert_called_with(create_connection_mock.return_value, ElasticMetric,
+                                          "mlflow-metrics", slices="auto", settings={},
+                                          delete_source=False,
+                                          source_excludes=METRIC_DOC_VALUE_FIELDS,
+                                          mappings=None, max_block_time=30.)
+
+
+def test_migrate_index_with_source_excludes():
+    es = mock.MagicMock()
+    es.indices.get_mapping.return_value = {
+        "mlflow-metrics-v1": {"mappings": {"_source": {"excludes": ["value"]}}}}
+    with pytest.raises(RuntimeError, match="mlflow-metrics-v1 excludes fields from _source"):
+        migrate_index(es, ElasticMetric)
+    es.reindex.assert_not_called()
+
+
+@mock.patch('mlflow_elasticsearchstore.models.ElasticColumnCatalog.init')
+def test_rebuild_column_catalogs(elastic_column_catalog_init_mock):
+    store = mock.MagicMock()
+    store._index_name.return_value = "mlflow-columns"
+    store.index_settings = {"columns": {}}
+    store.list_experiments.return_value = [SimpleNamespace(experiment_id="1"),
+                                           SimpleNamespace(experiment_id="2")]
+    rebuild_column_catalogs(store)
+    elastic_column_catalog_init_mock.assert_called_once_with(
+        index="mlflow-columns", using=store.using, settings={})
+    store.list_experiments.assert_called_once_with(ViewType.ALL)
+    assert store.rebuild_column_catalog.call_args_list == [mock.call("1"), mock.call("2")]
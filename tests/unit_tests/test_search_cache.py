@@ -0,0 +1,50 @@
+import mock
+
+from mlflow_elasticsearchstore.search_cache import InMemorySearchCache
+
+
+def test_in_memory_search_cache_get_set():
+    cache = InMemorySearchCache(ttl=60)
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@mock.patch('time.monotonic')
+def test_in_memory_search_cache_ttl(monotonic_mock):
+    cache = InMemorySearchCache(ttl=60)
+    monotonic_mock.return_value = 0
+    cache.set("key", "value")
+    monotonic_mock.return_value = 61
+    assert cache.get("key") is None
+
+
+def test_in_memory_search_cache_max_entries():
+    cache = InMemorySearchCache(ttl=60, max_entries=2)
+    cache.set("key0", "value0")
+    cache.set("key1", "value1")
+    cache.get("key0")
+    cache.set("key2", "value2")
+    assert cache.get("key1") is None
+    assert cache.get("key0") == "value0"
+    assert cache.get("key2") == "value2"
+
+
+def test_in_memory_search_cache_generations():
+    cache = InMemorySearchCache()
+    assert cache.get_generation("1") == 0
+    cache.bump_generation("1")
+    cache.bump_generation("1")
+    assert cache.get_generation("1") == 2
+    assert cache.get_generation("2") == 0
+
+
+@mock.patch('time.monotonic')
+def test_in_memory_search_cache_seconds_since_bump(monotonic_mock):
+    cache = InMemorySearchCache()
+    assert cache.seconds_since_bump("1") is None
+    monotonic_mock.return_value = 10
+    cache.bump_generation("1")
+    monotonic_mock.return_value = 12
+    assert cache.seconds_since_bump("1") == 2
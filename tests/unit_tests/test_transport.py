@@ -0,0 +1,117 @@
+import datetime
+import mock
+import pytest
+from elasticsearch.exceptions import ConnectionTimeout, SerializationError, TransportError
+from elasticsearch.serializer import JSONSerializer
+
+from mlflow_elasticsearchstore.backpressure import CircuitBreaker, CircuitBreakerOpenError
+from mlflow_elasticsearchstore.transport import (BackpressureTransport, ForkSafeTransport,
+                                                 OpaqueIdTransport, OrjsonSerializer,
+                                                 current_opaque_id, traced)
+
+
+@traced
+def outer_method():
+    return current_opaque_id(), inner_method()
+
+
+@traced
+def inner_method():
+    return current_opaque_id()
+
+
+def test_traced():
+    assert outer_method() == ("mlflow-elasticsearchstore/outer_method",
+                              "mlflow-elasticsearchstore/outer_method")
+    assert inner_method() == "mlflow-elasticsearchstore/inner_method"
+    assert current_opaque_id() is None
+
+
+@mock.patch('elasticsearch.Transport.perform_request')
+def test_opaque_id_transport(perform_request_mock):
+    transport = OpaqueIdTransport([{"host": "store_uri"}])
+
+    @traced
+    def search():
+        transport.perform_request("GET", "/mlflow-runs/_search", body={})
+    search()
+    perform_request_mock.assert_called_once_with(
+        "GET", "/mlflow-runs/_search", params=None, body={},
+        headers={"x-opaque-id": "mlflow-elasticsearchstore/search"})
+    transport.perform_request("GET", "/", headers={"x-opaque-id": "caller"})
+    assert perform_request_mock.call_args[1]["headers"] == {"x-opaque-id": "caller"}
+
+
+@mock.patch('elasticsearch.Transport.perform_request')
+def test_fork_safe_transport(perform_request_mock):
+    transport = ForkSafeTransport([{"host": "host1"}, {"host": "host2"}])
+    connections = list(transport.connection_pool.connections)
+    transport.perform_request("GET", "/")
+    assert transport.connection_pool.connections == connections
+    child_pid = transport._pid + 1
+    with mock.patch('os.getpid', return_value=child_pid):
+        transport.perform_request("GET", "/")
+    assert transport._pid == child_pid
+    assert len(transport.connection_pool.connections) == 2
+    assert not set(transport.connection_pool.connections) & set(connections)
+    assert transport.seed_connections == transport.connection_pool.connections
+    assert perform_request_mock.call_count == 2
+
+
+@mock.patch('time.sleep')
+@mock.patch('elasticsearch.Transport.perform_request')
+def test_backpressure_transport(perform_request_mock, sleep_mock):
+    rejection = TransportError(429, "es_rejected_execution_exception")
+    breaker = CircuitBreaker(threshold=1)
+    transport = BackpressureTransport([{"host": "store_uri"}], backoff_retries=2,
+                                      circuit_breaker=breaker)
+    perform_request_mock.side_effect = [rejection, {"acknowledged": True}]
+    assert transport.perform_request("PUT", "/mlflow-runs/_doc/1") == {"acknowledged": True}
+    assert sleep_mock.call_count == 1
+    assert not breaker.is_open
+    assert not breaker.is_healthy
+    perform_request_mock.side_effect = rejection
+    with pytest.raises(TransportError):
+        transport.perform_request("PUT", "/mlflow-runs/_doc/1")
+    assert perform_request_mock.call_count == 5
+    assert breaker.is_open
+    with pytest.raises(CircuitBreakerOpenError):
+        transport.perform_request("PUT", "/mlflow-runs/_doc/1")
+    assert perform_request_mock.call_count == 5
+
+
+@mock.patch('elasticsearch.Transport.perform_request')
+def test_backpressure_transport_failures(perform_request_mock):
+    breaker = CircuitBreaker(threshold=2)
+    transport = BackpressureTransport([{"host": "store_uri"}], backoff_retries=2,
+                                      circuit_breaker=breaker)
+    assert transport.retry_on_status == (502, 504)
+    perform_request_mock.side_effect = ConnectionTimeout("TIMEOUT", "read timed out")
+    with pytest.raises(ConnectionTimeout):
+        transport.perform_request("PUT", "/mlflow-runs/_doc/1")
+    assert perform_request_mock.call_count == 1
+    assert breaker.failures == 1
+    perform_request_mock.side_effect = TransportError(400, "mapper_parsing_exception")
+    with pytest.raises(TransportError):
+        transport.perform_request("PUT", "/mlflow-runs/_doc/1")
+    assert breaker.failures == 0
+    perform_request_mock.side_effect = TransportError(500, "internal_server_error")
+    for _ in range(2):
+        with pytest.raises(TransportError):
+            transport.perform_request("PUT", "/mlflow-runs/_doc/1")
+    assert perform_request_mock.call_count == 4
+    assert breaker.is_open
+
+
+def test_orjson_serializer():
+    serializer = OrjsonSerializer()
+    body = {"key": "metric1", "value": 0.5, "timestamp": datetime.datetime(2020, 1, 1),
+            "tags": ["été"]}
+    assert serializer.dumps(body) == JSONSerializer().dumps(body)
+    assert serializer.loads(serializer.dumps(body)) == JSONSerializer().loads(
+        JSONSerializer().dumps(body))
+    assert serializer.dumps("raw") == "raw"
+    with pytest.raises(SerializationError):
+        serializer.dumps({"value": object()})
+    with pytest.raises(SerializationError):
+        serializer.loads("{")